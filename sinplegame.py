@@ -1,10 +1,13 @@
 import random
-import math
 import os
-import heapq # For A* priority queue
-import time # For AI turn delay (optional)
+import heapq # For A* / Dijkstra priority queues
+import time # For AI turn delay (optional) and save file names
 import pickle # For saving/loading
-import datetime # For save file names
+import logging # Unit combat/status messages (level-gated)
+import sys
+from collections import namedtuple # Compact read-only stat records
+
+log = logging.getLogger("game")
 
 # --- Constants ---
 MAP_WIDTH = 12
@@ -13,30 +16,50 @@ INITIAL_GOLD = 100
 GOLD_PER_TURN = 25
 BASE_STARTING_HP = 100 # Bases can be attacked
 POISON_DAMAGE = 2 # Damage per turn for poison status
+SAVE_MAGIC = b"TBS1" # Save files start with this, then a format version byte, then the pickle
+SAVE_VERSION = 1
+
+# Grid neighbor offsets (orthogonal first, then diagonals)
+_NEIGHBORS4 = ((0, 1), (0, -1), (1, 0), (-1, 0))
+_NEIGHBORS8 = _NEIGHBORS4 + ((1, 1), (1, -1), (-1, 1), (-1, -1))
+
+# Visibility map values: 0 = unexplored, 1 = discovered, 2 = currently visible
+_DEMOTE_VISIBLE = bytes([0, 1, 1]) + bytes(range(3, 256)) # bytes.translate table: 2 -> 1
 
 # --- Terrain Definitions ---
+TerrainInfo = namedtuple("TerrainInfo", "name move_cost defense_bonus vision_cost symbol income", defaults=(0,)) # income defaults to 0
+
 TERRAIN_TYPES = {
-    "P": {"name": "Plains", "move_cost": 1, "defense_bonus": 0, "vision_cost": 1, "symbol": "."},
-    "M": {"name": "Mountain", "move_cost": 2, "defense_bonus": 2, "vision_cost": 2, "symbol": "^"},
-    "F": {"name": "Forest", "move_cost": 2, "defense_bonus": 1, "vision_cost": 2, "symbol": "#"},
-    "G": {"name": "Gold Mine", "move_cost": 1, "defense_bonus": 0, "vision_cost": 1, "symbol": "G", "income": 10}, # Provides income if unit waits on it
-    "B": {"name": "Base", "move_cost": 1, "defense_bonus": 1, "vision_cost": 1, "symbol": "B"}, # Player Base building location
+    "P": TerrainInfo(name="Plains", move_cost=1, defense_bonus=0, vision_cost=1, symbol="."),
+    "M": TerrainInfo(name="Mountain", move_cost=2, defense_bonus=2, vision_cost=2, symbol="^"),
+    "F": TerrainInfo(name="Forest", move_cost=2, defense_bonus=1, vision_cost=2, symbol="#"),
+    "G": TerrainInfo(name="Gold Mine", move_cost=1, defense_bonus=0, vision_cost=1, symbol="G", income=10), # Provides income if unit waits on it
+    "B": TerrainInfo(name="Base", move_cost=1, defense_bonus=1, vision_cost=1, symbol="B"), # Player Base building location
 }
+TERRAIN_BLOCKS_LOS = {key: key in ("M", "F") for key in TERRAIN_TYPES} # Mountains and Forests block line of sight
 
 # --- Unit Definitions ---
-# Format: "Name": {stats...}
+# Format: "Name": UnitStats(stats...)
+# ability, ability_cooldown and ability_duration are optional (None, 0, 0)
+UnitStats = namedtuple("UnitStats", "hp attack defense attack_range move_range vision_range cost symbol xp_value "
+                                    "ability ability_cooldown ability_duration", defaults=(None, 0, 0))
+
 # --- Added Scout ---
 # --- Modified Warrior (Bash ability), Mage (Fireball applies Poison) ---
 UNIT_STATS = {
-    "Warrior": {"hp": 25, "attack": 6, "defense": 3, "attack_range": 1, "move_range": 3, "vision_range": 2, "cost": 50, "symbol": "W", "xp_value": 10, "ability": "Bash", "ability_cooldown": 5}, # Changed ability to Bash
-    "Archer": {"hp": 15, "attack": 4, "defense": 1, "attack_range": 4, "move_range": 2, "vision_range": 4, "cost": 60, "symbol": "A", "xp_value": 12, "ability": "Long Shot", "ability_cooldown": 4},
-    "Cavalry": {"hp": 30, "attack": 7, "defense": 2, "attack_range": 1, "move_range": 5, "vision_range": 3, "cost": 80, "symbol": "C", "xp_value": 15, "ability": "Charge", "ability_cooldown": 5, "ability_duration": 1}, # Charge gives bonus this turn
-    "Mage": {"hp": 12, "attack": 5, "defense": 0, "attack_range": 3, "move_range": 2, "vision_range": 3, "cost": 70, "symbol": "M", "xp_value": 15, "ability": "Fireball", "ability_cooldown": 6}, # Fireball applies Poison chance
-    "Healer": {"hp": 15, "attack": 1, "defense": 1, "attack_range": 1, "move_range": 3, "vision_range": 3, "cost": 75, "symbol": "H", "xp_value": 8, "ability": "Heal", "ability_cooldown": 3},
-    "Scout": {"hp": 12, "attack": 2, "defense": 0, "attack_range": 1, "move_range": 6, "vision_range": 5, "cost": 40, "symbol": "S", "xp_value": 8, "ability": "Evade", "ability_cooldown": 4, "ability_duration": 1}, # New Unit
-    "Base": {"hp": BASE_STARTING_HP, "attack": 0, "defense": 2, "attack_range": 0, "move_range": 0, "vision_range": 2, "cost": 0, "symbol": "B", "xp_value": 50, "ability": None} # Static structure unit
+    "Warrior": UnitStats(hp=25, attack=6, defense=3, attack_range=1, move_range=3, vision_range=2, cost=50, symbol="W", xp_value=10, ability="Bash", ability_cooldown=5), # Changed ability to Bash
+    "Archer": UnitStats(hp=15, attack=4, defense=1, attack_range=4, move_range=2, vision_range=4, cost=60, symbol="A", xp_value=12, ability="Long Shot", ability_cooldown=4),
+    "Cavalry": UnitStats(hp=30, attack=7, defense=2, attack_range=1, move_range=5, vision_range=3, cost=80, symbol="C", xp_value=15, ability="Charge", ability_cooldown=5, ability_duration=1), # Charge gives bonus this turn
+    "Mage": UnitStats(hp=12, attack=5, defense=0, attack_range=3, move_range=2, vision_range=3, cost=70, symbol="M", xp_value=15, ability="Fireball", ability_cooldown=6), # Fireball applies Poison chance
+    "Healer": UnitStats(hp=15, attack=1, defense=1, attack_range=1, move_range=3, vision_range=3, cost=75, symbol="H", xp_value=8, ability="Heal", ability_cooldown=3),
+    "Scout": UnitStats(hp=12, attack=2, defense=0, attack_range=1, move_range=6, vision_range=5, cost=40, symbol="S", xp_value=8, ability="Evade", ability_cooldown=4, ability_duration=1), # New Unit
+    "Base": UnitStats(hp=BASE_STARTING_HP, attack=0, defense=2, attack_range=0, move_range=0, vision_range=2, cost=0, symbol="B", xp_value=50) # Static structure unit
 }
 
+# AI attack target preference among equal-HP targets (lower = attacked first; unlisted types 99)
+AI_TARGET_PRIORITY = {"Base": 0, "Healer": 1, "Mage": 2, "Archer": 3, "Cavalry": 4, "Warrior": 5, "Scout": 6}
+AI_BASH_PRIORITY_TYPES = frozenset(("Mage", "Healer")) # Stunning these is worth extra to the Warrior AI
+
 # --- Experience Levels ---
 # Level: (XP Threshold, Stat Bonus) - Bonus applied cumulatively
 XP_LEVELS = {
@@ -48,6 +71,13 @@ XP_LEVELS = {
 }
 MAX_LEVEL = max(XP_LEVELS.keys())
 
+# Level: Total stat bonus from all levels up to and including it (precomputed once)
+CUMULATIVE_BONUS = {
+    lvl: {stat: sum(XP_LEVELS[l][1][stat] for l in range(2, lvl + 1) if l in XP_LEVELS)
+          for stat in ("hp", "attack", "defense")}
+    for lvl in XP_LEVELS
+}
+
 # --- Status Effects ---
 STATUS_EFFECTS_INFO = {
     "Poison": {"symbol": "(P)", "desc": f"Takes {POISON_DAMAGE} damage per turn."},
@@ -66,132 +96,181 @@ def clear_screen():
 def distance(pos1, pos2):
     return abs(pos1[0] - pos2[0]) + abs(pos1[1] - pos2[1]) # Manhattan distance
 
-# --- A* Pathfinding ---
-class Node:
-    """Node for A* Pathfinding"""
-    def __init__(self, position, parent=None, g_cost=0, h_cost=0):
-        self.position = position
-        self.parent = parent
-        self.g_cost = g_cost # Cost from start
-        self.h_cost = h_cost # Heuristic cost to end
-        self.f_cost = g_cost + h_cost # Total estimated cost
+_MANHATTAN_DISKS = {} # radius -> offsets, see manhattan_disk
 
-    def __lt__(self, other): # For priority queue comparison
-        return self.f_cost < other.f_cost
+def manhattan_disk(radius):
+    """(dx, dy) offsets with |dx| + |dy| <= radius, column by column (dx outer, dy inner)."""
+    offsets = _MANHATTAN_DISKS.get(radius)
+    if offsets is None:
+        offsets = tuple((dx, dy) for dx in range(-radius, radius + 1)
+                        for dy in range(-radius + abs(dx), radius - abs(dx) + 1))
+        _MANHATTAN_DISKS[radius] = offsets
+    return offsets
 
-    def __eq__(self, other):
-        return self.position == other.position
+def has_line_of_sight(game_map, from_pos, to_pos):
+    """
+    Walks the Bresenham line between the two positions; a Mountain or Forest on
+    any tile strictly between them blocks the shot. Endpoints never block.
+    """
+    x, y = from_pos
+    x1, y1 = to_pos
+    dx, dy = abs(x1 - x), -abs(y1 - y)
+    step_x = 1 if x < x1 else -1
+    step_y = 1 if y < y1 else -1
+    err = dx + dy
+    width = game_map.width
+    blocks_los = game_map.blocks_los_grid
+    while x != x1 or y != y1:
+        e2 = 2 * err
+        if e2 >= dy:
+            err += dy
+            x += step_x
+        if e2 <= dx:
+            err += dx
+            y += step_y
+        if x == x1 and y == y1:
+            break
+        if blocks_los[y * width + x]:
+            return False
+    return True
 
-    def __hash__(self): # Required for storing nodes in sets/dictionaries
-        return hash(self.position)
+# --- A* Pathfinding ---
+def terrain_move_cost(terrain_key):
+    """Default unit_move_costs for a_star_pathfinding: every unit type pays the terrain's move_cost."""
+    return TERRAIN_TYPES[terrain_key].move_cost
+
+INF_COST = float('inf') # g_score of tiles not reached yet
+
+def pad_grid(values, width, height, fill=None):
+    """Copy of a flat width x height grid with a one-tile `fill` border (row stride width + 2),
+    so neighbor steps off the map land on a border cell instead of needing bounds checks."""
+    stride = width + 2
+    padded = [fill] * (stride * (height + 2))
+    for y in range(height):
+        start = (y + 1) * stride + 1
+        padded[start:start + width] = values[y * width:(y + 1) * width]
+    return padded
 
 def a_star_pathfinding(game_map, start_pos, end_pos, unit_move_costs):
     """
     Finds the shortest path using A*.
     unit_move_costs: A function(terrain_key) -> cost for the specific unit.
+        Costs must be >= 1 (or None for impassable): that keeps the Manhattan
+        heuristic consistent, so a tile is final once popped and is never reopened.
     Returns a list of positions (path) or None if no path found.
     """
-    start_node = Node(start_pos, g_cost=0, h_cost=distance(start_pos, end_pos))
-    end_node = Node(end_pos) # We only need the position for comparison
-
-    open_list = [] # Priority queue (min-heap)
-    closed_set = set() # Positions already evaluated
-
-    heapq.heappush(open_list, start_node)
+    # Search state lives in flat per-tile arrays indexed on the padded grid
+    # (index = (y + 1) * stride + x + 1, see pad_grid) rather than position-keyed dicts.
+    # The border cells are impassable, so neighbor steps are plain index offsets with
+    # no bounds checks. The open list holds (f_cost, tie, index) tuples; improved
+    # paths are pushed as new entries and stale entries are skipped on pop.
+    width = game_map.width
+    stride = width + 2
+    sx, sy = start_pos
+    ex, ey = end_pos
+    start_idx = (sy + 1) * stride + sx + 1
+    end_idx = (ey + 1) * stride + ex + 1
+
+    # Per-tile step cost for this search (None = can't enter: border, impassable terrain for this unit,
+    # or occupied -- cannot path through occupied tiles, except the destination).
+    # Pathfinding assumes knowledge of map terrain, not the unit's visibility.
+    if unit_move_costs is terrain_move_cost:
+        step_costs = game_map.padded_move_cost_grid[:] # Plain terrain costs are already laid out per tile
+    else:
+        cost_by_terrain = {key: unit_move_costs(key) for key in TERRAIN_TYPES}
+        step_costs = pad_grid([cost_by_terrain[key] for key in game_map.terrain_key_grid], width, game_map.height)
+    unit_blocked = game_map.unit_blocked
+    end_tile = ey * width + ex if game_map.is_valid_coordinate(end_pos) else -1
+    blocked_idx = unit_blocked.find(1)
+    while blocked_idx != -1:
+        if blocked_idx != end_tile:
+            by, bx = divmod(blocked_idx, width)
+            step_costs[(by + 1) * stride + bx + 1] = None
+        blocked_idx = unit_blocked.find(1, blocked_idx + 1)
+
+    g_score = [INF_COST] * len(step_costs) # Best known cost from start
+    came_from = [-1] * len(step_costs) # index -> previous index on best path (-1 = none)
+    closed, gen = game_map.begin_search() # closed[idx] == gen -> tile already evaluated
+    g_score[start_idx] = 0
+    tie = 0 # Insertion counter, keeps heap ordering stable for equal f_cost
+    # (index offset, dx, dy) per neighbor, same order as _NEIGHBORS4
+    neighbor_steps = tuple((dy * stride + dx, dx, dy) for dx, dy in _NEIGHBORS4)
+
+    open_list = [(abs(sx - ex) + abs(sy - ey), tie, start_idx)] # Priority queue (min-heap)
 
     while open_list:
-        current_node = heapq.heappop(open_list)
+        _, _, current_idx = heapq.heappop(open_list)
 
-        if current_node == end_node:
+        if closed[current_idx] == gen:
+            continue # Stale entry, a cheaper path to this tile was already expanded
+
+        if current_idx == end_idx:
             # Path found, reconstruct it
             path = []
-            temp = current_node
-            while temp:
-                path.append(temp.position)
-                temp = temp.parent
+            idx = current_idx
+            while idx != -1:
+                path.append((idx % stride - 1, idx // stride - 1))
+                idx = came_from[idx]
             return path[::-1] # Return reversed path (start to end)
 
-        closed_set.add(current_node.position)
+        closed[current_idx] = gen
+        current_g = g_score[current_idx]
+        cy, cx = divmod(current_idx, stride)
 
         # Explore neighbors
-        for dx, dy in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
-            next_x, next_y = current_node.position[0] + dx, current_node.position[1] + dy
-            next_pos = (next_x, next_y)
-
-            if not game_map.is_valid_coordinate(next_pos):
-                continue # Out of bounds
-
-            if next_pos in closed_set:
-                continue # Already evaluated
-
-            neighbor_tile = game_map.get_tile(next_pos)
-            # Check if tile is passable (cannot path through occupied tiles, except the destination)
-            # Check visibility for pathing? No, pathfinding assumes knowledge of map terrain.
-            if neighbor_tile.unit and neighbor_tile.unit.is_alive and next_pos != end_pos:
-                 continue
-
-            terrain_key = game_map.get_terrain_key(next_pos)
-            move_cost_to_neighbor = unit_move_costs(terrain_key)
-            if move_cost_to_neighbor is None: # Impassable terrain for this unit
+        for offset, dx, dy in neighbor_steps:
+            idx = current_idx + offset
+            move_cost_to_neighbor = step_costs[idx]
+            if move_cost_to_neighbor is None: # Off the map, impassable or occupied
                 continue
-
-            g_cost = current_node.g_cost + move_cost_to_neighbor
-            h_cost = distance(next_pos, end_pos)
-            neighbor_node = Node(next_pos, parent=current_node, g_cost=g_cost, h_cost=h_cost)
-
-            # Check if neighbor is in open_list and if this path is better
-            found_in_open = False
-            for i, node in enumerate(open_list):
-                 if node == neighbor_node:
-                      found_in_open = True
-                      if neighbor_node.g_cost < node.g_cost:
-                           # Update the node in the heap - tricky, easier to replace/re-add
-                           open_list[i] = neighbor_node
-                           heapq.heapify(open_list) # Re-sort the heap
-                      break
-
-            if not found_in_open:
-                 heapq.heappush(open_list, neighbor_node)
+            if closed[idx] == gen:
+                continue # Already evaluated; with a consistent heuristic its g_score can't improve
+
+            tentative_g = current_g + move_cost_to_neighbor
+            if tentative_g < g_score[idx]:
+                 g_score[idx] = tentative_g
+                 came_from[idx] = current_idx
+                 tie += 1
+                 # Manhattan distance to the goal, inlined (this runs once per neighbor)
+                 next_x, next_y = cx + dx - 1, cy + dy - 1 # Back to map coordinates
+                 h_cost = (next_x - ex if next_x >= ex else ex - next_x) + (next_y - ey if next_y >= ey else ey - next_y)
+                 heapq.heappush(open_list, (tentative_g + h_cost, tie, idx))
 
     return None # No path found
 
 
 # --- Tile Class ---
 class Tile:
+    __slots__ = ("terrain_key", "terrain_info", "name", "move_cost", "defense_bonus", "vision_cost", "symbol",
+                 "provides_income", "unit")
+
     def __init__(self, terrain_key):
         self.terrain_key = terrain_key
-        self.terrain_info = TERRAIN_TYPES[terrain_key]
-        self.name = self.terrain_info["name"]
-        self.move_cost = self.terrain_info["move_cost"]
-        self.defense_bonus = self.terrain_info["defense_bonus"]
-        self.vision_cost = self.terrain_info["vision_cost"]
-        self.symbol = self.terrain_info["symbol"]
-        self.provides_income = self.terrain_info.get("income", 0)
+        self.terrain_info = info = TERRAIN_TYPES[terrain_key]
+        (self.name, self.move_cost, self.defense_bonus,
+         self.vision_cost, self.symbol, self.provides_income) = info
         self.unit = None # Unit currently on the tile
-        self.is_visible = False # For Fog of War (player's perspective)
-        self.is_discovered = False # Has the player ever seen this tile?
+        # Fog of War and highlight state are not stored per tile; each Player's visibility_map
+        # holds fog, and GameMap.render_lines builds highlight marks per frame
 
-        # --- Added for Highlighting ---
-        self.highlight_move = False
-        self.highlight_attack = False
-        # -----------------------------
-
-    def display(self, player_perspective=True):
-        """How the tile should be displayed"""
+    def display(self, vis_state=None, highlight=0):
+        """How the tile should be displayed.
+        vis_state: the viewer's visibility_map value for this tile (0/1/2), or None for the objective view.
+        highlight: 0 = none, 1 = move range, 2 = attack target."""
         # --- Highlighting takes precedence ---
-        if self.highlight_attack: return "!"
-        if self.highlight_move: return "*"
+        if highlight == 2: return "!"
+        if highlight == 1: return "*"
         # -----------------------------------
 
-        if player_perspective:
-            if self.is_visible:
+        if vis_state is not None:
+            if vis_state == 2:
                 if self.unit and self.unit.is_alive:
                     # Show unit symbol, maybe color-coded for player/enemy
                     p_symbol = self.unit.symbol.upper() if self.unit.player.id == 0 else self.unit.symbol.lower()
                     return p_symbol
                 else:
                     return self.symbol # Show terrain
-            elif self.is_discovered:
+            elif vis_state == 1:
                 return self.symbol.lower() # Show known terrain, but faded/lowercase
             else:
                 return " " # Undiscovered fog
@@ -204,6 +283,15 @@ class Tile:
 
 # --- Unit Class ---
 class Unit:
+    __slots__ = ("id", "player", "type", "position", "is_alive",
+                 "base_hp", "base_attack", "base_defense", "attack_range", "base_move_range", "vision_range",
+                 "symbol", "xp_value", "ability_name", "max_ability_cooldown", "ability_duration",
+                 "level", "xp", "xp_to_next_level", "max_hp", "hp", "attack", "defense", "move_range",
+                 "ability_cooldown_timer", "ability_active_timer",
+                 "effective_defense", "effective_attack_range", "effective_move_range", "is_stunned",
+                 "has_moved", "has_attacked", "has_used_ability", "status_effects", "_valid_moves_cache",
+                 "_possible_targets_cache")
+
     def __init__(self, unit_id, player, unit_type, position, base_stats):
         self.id = unit_id
         self.player = player
@@ -212,26 +300,21 @@ class Unit:
         self.is_alive = True
 
         # Base stats from definition
-        self.base_hp = base_stats["hp"]
-        self.base_attack = base_stats["attack"]
-        self.base_defense = base_stats["defense"]
-        self.attack_range = base_stats["attack_range"]
-        self.base_move_range = base_stats["move_range"]
-        self.vision_range = base_stats["vision_range"]
-        self.symbol = base_stats["symbol"]
-        self.xp_value = base_stats["xp_value"] # XP awarded for defeating this unit
-        self.ability_name = base_stats.get("ability")
-        self.max_ability_cooldown = base_stats.get("ability_cooldown", 0)
-        self.ability_duration = base_stats.get("ability_duration", 0) # For temp effects
+        (self.base_hp, self.base_attack, self.base_defense, self.attack_range, self.base_move_range,
+         self.vision_range, _cost, self.symbol, self.xp_value, # xp_value: XP awarded for defeating this unit
+         self.ability_name, self.max_ability_cooldown, self.ability_duration) = base_stats # duration: for temp effects
 
         # Dynamic stats
         self.level = 1
         self.xp = 0
         self.xp_to_next_level = XP_LEVELS[2][0] if 2 in XP_LEVELS else float('inf')
-        self.hp = self.base_hp
+        self.max_hp = self.base_hp + CUMULATIVE_BONUS[self.level]["hp"] # Recomputed on level up
+        self.hp = self.max_hp
         self.attack = self.base_attack
         self.defense = self.base_defense
         self.move_range = self.base_move_range
+        self._valid_moves_cache = None # (search key, reachable tiles) from the last get_valid_moves
+        self._possible_targets_cache = None # (scan key, targets) from the last full get_possible_targets scan
         self.ability_cooldown_timer = 0
         self.ability_active_timer = 0 # For duration effects
 
@@ -243,44 +326,62 @@ class Unit:
         # --- Added for Status Effects ---
         self.status_effects = {} # Format: {"effect_name": duration}
         # -------------------------------
-
-    @property
-    def max_hp(self):
-        # Calculate max HP based on level bonuses
-        bonus = sum(XP_LEVELS[lvl][1]["hp"] for lvl in range(2, self.level + 1) if lvl in XP_LEVELS)
-        return self.base_hp + bonus
+        self._refresh_effective_stats()
+
+    def __getstate__(self):
+        # Saved without the search caches; they refill on the next call
+        state = {name: getattr(self, name) for name in self.__slots__}
+        state["_valid_moves_cache"] = state["_possible_targets_cache"] = None
+        return None, state
+
+    def _refresh_effective_stats(self):
+        """Folds temporary buffs (active ability timer, Evade/Charge status) into effective_* stats,
+        and Stun into is_stunned. Call whenever level, ability_active_timer or status_effects change."""
+        self.is_stunned = "Stun" in self.status_effects
+        buff_active = self.ability_active_timer > 0
+        self.effective_defense = self.defense
+        if buff_active and self.ability_name == "Shield Wall":
+             self.effective_defense += 3 # Shield Wall bonus defense - REMOVED Warrior Ability
+        if "Evade" in self.status_effects:
+             self.effective_defense += 2 # Evade bonus defense
+        self.effective_attack_range = self.attack_range
+        if buff_active and self.ability_name == "Long Shot":
+             self.effective_attack_range += 2 # Temp range increase
+        self.effective_move_range = self.move_range
+        if "Charge" in self.status_effects:
+             self.effective_move_range += 2 # Temp move bonus
 
     def _update_stats_for_level(self):
         """Recalculates stats based on current level"""
-        hp_bonus = sum(XP_LEVELS[lvl][1]["hp"] for lvl in range(2, self.level + 1) if lvl in XP_LEVELS)
-        attack_bonus = sum(XP_LEVELS[lvl][1]["attack"] for lvl in range(2, self.level + 1) if lvl in XP_LEVELS)
-        defense_bonus = sum(XP_LEVELS[lvl][1]["defense"] for lvl in range(2, self.level + 1) if lvl in XP_LEVELS)
+        bonus = CUMULATIVE_BONUS[self.level]
 
         # Note: We only update the base for max_hp, current stats are modified directly
         # self.hp = self.max_hp # Option: fully heal on level up? Usually yes.
-        self.attack = self.base_attack + attack_bonus
-        self.defense = self.base_defense + defense_bonus
+        self.attack = self.base_attack + bonus["attack"]
+        self.defense = self.base_defense + bonus["defense"]
+        self._refresh_effective_stats()
         # Could potentially increase move/range/vision too
-        print(f"{self.player.name}'s {self.type} (ID: {self.id}) stats updated for Level {self.level}!")
+        log.info("%s's %s (ID: %s) stats updated for Level %s!", self.player.name, self.type, self.id, self.level)
 
 
     def gain_xp(self, amount):
         if self.level >= MAX_LEVEL:
             return
         self.xp += amount
-        print(f"{self.player.name}'s {self.type} (ID: {self.id}) gained {amount} XP.")
+        log.info("%s's %s (ID: %s) gained %s XP.", self.player.name, self.type, self.id, amount)
         while self.xp >= self.xp_to_next_level and self.level < MAX_LEVEL:
             self.level_up()
 
     def level_up(self):
         if self.level >= MAX_LEVEL:
             return
-        print(f"{self.player.name}'s {self.type} (ID: {self.id}) leveled up to Level {self.level + 1}!")
+        log.info("%s's %s (ID: %s) leveled up to Level %s!", self.player.name, self.type, self.id, self.level + 1)
         self.level += 1
+        self.max_hp = self.base_hp + CUMULATIVE_BONUS[self.level]["hp"]
         # Fully heal on level up
         hp_before = self.hp
-        self.hp = self.max_hp # Recalculates max HP based on new level
-        print(f"  HP restored from {hp_before} to {self.hp}.")
+        self.hp = self.max_hp
+        log.info("  HP restored from %s to %s.", hp_before, self.hp)
 
         self._update_stats_for_level() # Apply stat bonuses
 
@@ -289,39 +390,34 @@ class Unit:
         else:
             self.xp = 0 # Or keep accumulating for score?
             self.xp_to_next_level = float('inf')
-            print(f"{self.type} reached Max Level!")
+            log.info("%s reached Max Level!", self.type)
 
 
     def take_damage(self, damage, attacker=None):
         if not self.is_alive: return # Can't damage dead units
 
-        effective_defense = self.defense
-        # Check for temporary defense buffs
-        if self.ability_name == "Shield Wall" and self.ability_active_timer > 0:
-             effective_defense += 3 # Shield Wall bonus defense - REMOVED Warrior Ability
-             print(f"  (Shield Wall active! Defense: {effective_defense})")
-        # --- Add Evade Bonus (Scout) ---
-        if "Evade" in self.status_effects:
-            effective_defense += 2 # Evade bonus defense
-            print(f"  (Evade active! Defense: {effective_defense})")
-        # ----------------------------------
+        effective_defense = self.effective_defense # Includes Shield Wall / Evade buffs
+        if effective_defense > self.defense:
+             log.info("  (Defense buff active! Defense: %s)", effective_defense)
 
         # Add terrain bonus
-        tile = self.player.game.map.get_tile(self.position)
-        terrain_bonus = tile.defense_bonus if tile else 0
+        game_map = self.player.game.map
+        terrain_bonus = game_map.defense_bonus_grid[self.position[1] * game_map.width + self.position[0]]
         total_defense = effective_defense + terrain_bonus
         if terrain_bonus > 0:
-             print(f"  (Terrain bonus: +{terrain_bonus} Defense)")
+             log.info("  (Terrain bonus: +%s Defense)", terrain_bonus)
 
         actual_damage = max(1, damage - total_defense) # Always at least 1 damage
         self.hp -= actual_damage
 
-        print(f"{self.player.name}'s {self.type} (ID: {self.id}) took {actual_damage} damage. HP: {self.hp}/{self.max_hp}")
+        log.info("%s's %s (ID: %s) took %s damage. HP: %s/%s", self.player.name, self.type, self.id, actual_damage, self.hp, self.max_hp)
 
         if self.hp <= 0:
             self.hp = 0
             self.is_alive = False
-            print(f"{self.player.name}'s {self.type} (ID: {self.id}) has been defeated!")
+            game_map.unit_died(self) # Tile no longer blocks movement
+            self.player.unit_died(self)
+            log.info("%s's %s (ID: %s) has been defeated!", self.player.name, self.type, self.id)
             # Grant XP to the attacker if provided
             if attacker and attacker.is_alive:
                  attacker.gain_xp(self.xp_value)
@@ -331,8 +427,9 @@ class Unit:
         elif attacker and attacker.is_alive and self.can_retaliate():
             dist = distance(self.position, attacker.position)
             if dist <= self.attack_range: # Ensure attacker is in range for retaliation (usually 1)
-                print(f"  {self.type} (ID: {self.id}) retaliates!")
-                time.sleep(0.3) # Small pause for clarity
+                log.info("  %s (ID: %s) retaliates!", self.type, self.id)
+                if self.player.game.interactive:
+                    time.sleep(0.3) # Small pause for clarity (skipped in headless runs)
                 # Pass self as attacker, attacker as target
                 attacker.take_damage(self.attack, attacker=self)
                 self.has_attacked = True # Retaliation uses the attack action
@@ -344,216 +441,116 @@ class Unit:
         return (self.is_alive and
                 self.attack_range >= 1 and # Must have a melee attack at least
                 not self.has_attacked and # Cannot retaliate if already attacked
-                "Stun" not in self.status_effects) # Cannot retaliate if stunned
+                not self.is_stunned) # Cannot retaliate if stunned
     # ----------------------------
 
     def can_attack(self, target_unit, game_map):
         if (not target_unit or
             not target_unit.is_alive or
             target_unit.player == self.player or
-            "Stun" in self.status_effects): # Cannot attack if stunned
+            self.is_stunned): # Cannot attack if stunned
             return False
         dist = distance(self.position, target_unit.position)
 
-        attack_range = self.attack_range
-        # Handle Long Shot ability for Archer
-        if self.ability_name == "Long Shot" and self.ability_active_timer > 0:
-             attack_range += 2 # Temp range increase
-             print(" (Long Shot active!)")
+        attack_range = self.effective_attack_range
+        if attack_range > self.attack_range:
+             log.info(" (Long Shot active!)")
 
 
         if dist > attack_range:
              return False
 
         # Line of Sight Check (Optional but good with ranged units/terrain)
-        # Basic check: No blocking terrain (Mountains/Forests) directly between
-        # More complex: Check all tiles on the line using Bresenham's or similar
-        if self.attack_range > 1: # Only check LoS for ranged attacks
-             # Simplified LoS: check tiles directly adjacent to target in line from attacker
-             dx = target_unit.position[0] - self.position[0]
-             dy = target_unit.position[1] - self.position[1]
-             # Check the tile before the target if not adjacent
-             if dist > 1:
-                  check_x, check_y = target_unit.position[0], target_unit.position[1]
-                  # Determine the tile adjacent to the target along the line from the attacker
-                  # This simplified check looks one step back from the target
-                  if abs(dx) > abs(dy): # More horizontal line
-                      check_x -= int(math.copysign(1, dx))
-                  elif abs(dy) > abs(dx): # More vertical line
-                      check_y -= int(math.copysign(1, dy))
-                  else: # Diagonal - check the step back along the diagonal
-                      check_x -= int(math.copysign(1, dx))
-                      check_y -= int(math.copysign(1, dy))
-
-                  block_pos = (check_x, check_y)
-                  # Ensure the checked position isn't the attacker's own position for adjacent checks
-                  if block_pos != self.position and game_map.is_valid_coordinate(block_pos):
-                      blocking_tile = game_map.get_tile(block_pos)
-                      # Mountains and Forests block LoS
-                      if blocking_tile.terrain_key in ["M", "F"]:
-                          print(" (Line of sight blocked!)")
-                          return False
+        if self.attack_range > 1 and dist > 1: # Only check LoS for ranged attacks on non-adjacent targets
+             if not has_line_of_sight(game_map, self.position, target_unit.position):
+                  log.info(" (Line of sight blocked!)")
+                  return False
         return True
 
     def get_valid_moves(self, game_map):
-        """Use BFS to find all reachable tiles within move_range."""
-        if "Stun" in self.status_effects: # Cannot move if stunned
+        """Use Dijkstra (terrain costs vary) to find all reachable tiles within move_range.
+        The result is reused until the unit, its move range or any unit on the map changes;
+        callers must not mutate the returned set."""
+        if self.is_stunned: # Cannot move if stunned
             return {self.position} # Only the current position is 'reachable'
 
-        q = [(self.position, 0)] # (position, cost)
-        visited = {self.position: 0} # pos: cost
+        move_range = self.effective_move_range # Includes Cavalry's Charge bonus
+        cache_key = (game_map, game_map.occupancy_version, self.position, move_range)
+        cached = self._valid_moves_cache
+        if cached is not None and cached[0] == cache_key:
+            return cached[1]
+
+        # Bind map grids once; the neighbor loop below reads them directly
+        width = game_map.width
+        neighbors4 = game_map.neighbors4
+        move_cost_grid = game_map.move_cost_grid
+        unit_blocked = game_map.unit_blocked
+
+        # Best known cost per tile lives in the map's reusable search buffers:
+        # best_cost[idx] is only meaningful where seen[idx] == gen
+        seen, gen = game_map.begin_search()
+        best_cost = game_map._search_cost
+        start_idx = self.position[1] * width + self.position[0]
+        seen[start_idx] = gen
+        best_cost[start_idx] = 0
+
+        q = [(0, self.position, start_idx)] # Min-heap of (cost, position, flat index)
         reachable_tiles = {self.position} # Include starting position
 
-        move_range = self.move_range
-        # Apply Charge ability effect for Cavalry
-        if "Charge" in self.status_effects: # Check status effect for Charge
-             move_range += 2 # Temp move bonus
-
         while q:
-            curr_pos, curr_cost = q.pop(0)
+            curr_cost, curr_pos, curr_idx = heapq.heappop(q)
+            if curr_cost > best_cost[curr_idx]:
+                continue # Stale entry, already expanded with a lower cost
 
             # Optimization: if current cost is already >= move_range, no need to check neighbors
             # But neighbors might have cost 1, so check new_cost instead
             # if curr_cost >= move_range:
             #     continue
 
-            # Explore neighbors
-            for dx, dy in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
-                next_x, next_y = curr_pos[0] + dx, curr_pos[1] + dy
-                next_pos = (next_x, next_y)
-
-                if not game_map.is_valid_coordinate(next_pos):
-                    continue
-
-                next_tile = game_map.get_tile(next_pos)
-                terrain_cost = next_tile.move_cost
-                new_cost = curr_cost + terrain_cost
+            # Explore neighbors (precomputed, already inside the map)
+            for idx, next_pos in neighbors4[curr_idx]:
+                new_cost = curr_cost + move_cost_grid[idx]
 
                 # Check if valid move
                 if new_cost <= move_range:
                      # Cannot move into occupied tiles (unless it's the unit itself in visited)
-                     if next_tile.unit and next_tile.unit.is_alive: # and next_pos != self.position:
+                     if unit_blocked[idx]: # and next_pos != self.position:
                           continue
                      # Check if already visited with a lower or equal cost
-                     if next_pos in visited and visited[next_pos] <= new_cost:
+                     if seen[idx] == gen and best_cost[idx] <= new_cost:
                           continue
 
-                     visited[next_pos] = new_cost
+                     seen[idx] = gen
+                     best_cost[idx] = new_cost
                      reachable_tiles.add(next_pos)
-                     q.append((next_pos, new_cost))
+                     heapq.heappush(q, (new_cost, next_pos, idx))
 
+        self._valid_moves_cache = (cache_key, reachable_tiles)
         return reachable_tiles
 
     def can_use_ability(self):
         return (self.ability_name and
                 self.ability_cooldown_timer <= 0 and
-                "Stun" not in self.status_effects) # Cannot use ability if stunned
+                not self.is_stunned) # Cannot use ability if stunned
 
     def use_ability(self, target=None):
         """ Target can be position or unit depending on ability """
         if not self.can_use_ability():
-             print("Ability not ready or unit stunned!")
+             log.info("Ability not ready or unit stunned!")
              return False
 
-        print(f"{self.player.name}'s {self.type} (ID: {self.id}) uses {self.ability_name}!")
+        log.info("%s's %s (ID: %s) uses %s!", self.player.name, self.type, self.id, self.ability_name)
         self.ability_cooldown_timer = self.max_ability_cooldown
         # Assume ability takes the 'attack' action slot unless specified otherwise
         self.has_used_ability = True
         self.has_attacked = True
 
-        # --- Implement Ability Effects ---
-        # --- Updated: Bash(Warrior), Fireball(Mage), Evade(Scout) ---
-        if self.ability_name == "Bash": # Warrior - Target adjacent enemy
-             if isinstance(target, Unit) and target.player != self.player and target.is_alive:
-                 if distance(self.position, target.position) == 1:
-                     print(f"  Bashes {target.type} (ID: {target.id})!")
-                     target.apply_status("Stun", 1) # Stun for 1 turn duration
-                     # Maybe deal small damage too?
-                     # target.take_damage(self.attack // 2, attacker=self)
-                     return True
-                 else:
-                     print("  Target is not adjacent.")
-             else:
-                 print("  Invalid target for Bash (must be living adjacent enemy unit).")
-
-        elif self.ability_name == "Long Shot": # Archer - Passive activation for next shot?
-            # Let's make Long Shot a self-buff that lasts 1 turn affecting the next attack
-            self.ability_active_timer = 1 + 1 # Activate for this action phase + next turn start decrement
-            print("  Taking careful aim for the next shot (increased range).")
-            # The range check happens in can_attack. Doesn't consume attack action itself.
-            self.has_attacked = False # Activating buff doesn't count as attack
-            return True # Activation successful
-
-        elif self.ability_name == "Charge": # Cavalry - Activate for bonus move this turn
-            self.apply_status("Charge", 1) # Apply Charge status for 1 turn
-            print("  Preparing to charge! (Increased move range this turn)")
-            # Doesn't consume attack action itself.
-            self.has_attacked = False # Activating buff doesn't count as attack
-            return True
-
-        elif self.ability_name == "Fireball": # Mage - Area Effect, now applies Poison chance
-            if isinstance(target, tuple) and self.player.game.map.is_valid_coordinate(target):
-                 if distance(self.position, target) > self.attack_range:
-                     print(f"  Target position {target} is out of range ({self.attack_range}).")
-                     self.ability_cooldown_timer = 0 # Refund cooldown
-                     self.has_used_ability = False # Reset flags
-                     self.has_attacked = False
-                     return False
-
-                 aoe_radius = 1 # Tiles around target
-                 print(f"  Casting Fireball at {target}!")
-                 affected_units = []
-                 for x in range(target[0] - aoe_radius, target[0] + aoe_radius + 1):
-                      for y in range(target[1] - aoe_radius, target[1] + aoe_radius + 1):
-                           pos = (x,y)
-                           # Check distance and map bounds using Chebyshev distance for square AoE
-                           # if max(abs(target[0]-pos[0]), abs(target[1]-pos[1])) <= aoe_radius and self.player.game.map.is_valid_coordinate(pos):
-                           # Let's use Manhattan distance for AoE to match movement/range
-                           if distance(target, pos) <= aoe_radius and self.player.game.map.is_valid_coordinate(pos):
-                               unit_on_tile = self.player.game.map.get_unit_at(pos, check_visibility=False) # AI needs objective view for AoE
-                               if unit_on_tile and unit_on_tile.is_alive:
-                                   # AoE often hits friendlies too! Be careful.
-                                   # if unit_on_tile.player != self.player: # Uncomment to avoid friendly fire
-                                   affected_units.append(unit_on_tile)
-
-                 if not affected_units: print("  ...but hit nothing.")
-                 fireball_damage = self.attack + 2 # Fireball deals slightly more damage
-                 poison_chance = 0.3 # 30% chance to poison
-
-                 for hit_unit in affected_units:
-                      print(f"  Hit {hit_unit.player.name}'s {hit_unit.type}!")
-                      hit_unit.take_damage(fireball_damage, attacker=self) # Pass self for XP gain
-                      # Apply poison chance
-                      if hit_unit.is_alive and random.random() < poison_chance:
-                           print(f"  {hit_unit.type} is Poisoned!")
-                           hit_unit.apply_status("Poison", 3) # Poison for 3 turns
-                 return True
-            else:
-                 print("  Invalid target position for Fireball.")
-
-        elif self.ability_name == "Heal": # Healer
-            if isinstance(target, Unit) and target.is_alive and target.player == self.player:
-                 if distance(self.position, target.position) <= self.attack_range: # Heal needs range check
-                    heal_amount = 10 + self.level # Healing scales slightly with level
-                    actual_healed = min(heal_amount, target.max_hp - target.hp) # Cannot heal above max HP
-                    target.hp += actual_healed
-                    print(f"  Healed {target.type} (ID: {target.id}) for {actual_healed} HP. (Current: {target.hp}/{target.max_hp})")
-                    return True
-                 else:
-                    print(f"  Target {target.type} is out of range.")
-            else:
-                 print("  Invalid target for Heal (must be living friendly unit in range).")
-
-        # --- Added Evade (Scout) ---
-        elif self.ability_name == "Evade": # Scout - Self buff
-            self.apply_status("Evade", self.ability_duration) # Use status effect system
-            print("  Using evasive maneuvers! (Defense increased)")
-            self.has_attacked = False # Activating buff doesn't count as attack
-            return True
-        # -------------------------
-
-        else:
-             print("  Ability effect not implemented.")
+        # --- Implement Ability Effects (see ABILITY_HANDLERS) ---
+        handler = ABILITY_HANDLERS.get(self.ability_name)
+        if handler is None:
+             log.info("  Ability effect not implemented.")
+        elif handler(self, target, self.player.game):
+             return True
 
         # If ability failed (e.g., invalid target), refund cooldown and action flags
         self.ability_cooldown_timer = 0
@@ -566,11 +563,12 @@ class Unit:
     def apply_status(self, effect_name, duration):
         """Applies a status effect for a given duration."""
         if effect_name not in STATUS_EFFECTS_INFO:
-            print(f"Warning: Unknown status effect '{effect_name}'")
+            log.warning("Unknown status effect '%s'", effect_name)
             return
         # Apply effect or refresh duration if already present
         self.status_effects[effect_name] = duration
-        print(f"{self.type} (ID: {self.id}) is now affected by {effect_name} for {duration} turns.")
+        self._refresh_effective_stats()
+        log.info("%s (ID: %s) is now affected by %s for %s turns.", self.type, self.id, effect_name, duration)
 
     def tick_status_effects(self):
         """Applies effects like DoT and decrements durations. Called at turn start."""
@@ -582,7 +580,7 @@ class Unit:
         for effect, duration in current_effects:
             # Apply effects active at start of turn
             if effect == "Poison":
-                print(f"{self.type} (ID: {self.id}) takes {POISON_DAMAGE} damage from Poison.")
+                log.info("%s (ID: %s) takes %s damage from Poison.", self.type, self.id, POISON_DAMAGE)
                 self.take_damage(POISON_DAMAGE, attacker=None) # No attacker for poison source
                 if not self.is_alive: break # Stop processing if poison killed the unit
 
@@ -597,7 +595,9 @@ class Unit:
         for effect in effects_to_remove:
             if effect in self.status_effects:
                 del self.status_effects[effect]
-                print(f"{self.type} (ID: {self.id}) is no longer affected by {effect}.")
+                log.info("%s (ID: %s) is no longer affected by %s.", self.type, self.id, effect)
+        if effects_to_remove:
+            self._refresh_effective_stats()
 
     # --- Modified for Stun ---
     def tick_cooldowns(self):
@@ -610,14 +610,15 @@ class Unit:
         if self.ability_active_timer > 0:
              self.ability_active_timer -= 1
              if self.ability_active_timer == 0:
-                  print(f"{self.type} (ID:{self.id})'s {self.ability_name} passive effect wore off.")
+                  log.info("%s (ID:%s)'s %s passive effect wore off.", self.type, self.id, self.ability_name)
+                  self._refresh_effective_stats()
                   # Reset any temporary stat changes here if needed (e.g., if Long Shot added attack)
 
 
     def reset_turn(self):
         # --- Check for Stun before resetting ---
-        if "Stun" in self.status_effects:
-            print(f"{self.type} (ID: {self.id}) is Stunned and cannot act!")
+        if self.is_stunned:
+            log.info("%s (ID: %s) is Stunned and cannot act!", self.type, self.id)
             # Do not reset flags if stunned, effectively skipping the turn
         else:
             self.has_moved = False
@@ -627,35 +628,62 @@ class Unit:
 
     # --- Modified for Stun ---
     def can_act(self):
-        if "Stun" in self.status_effects:
+        if self.is_stunned:
             return False
         return not (self.has_moved and self.has_attacked) # Simplified: Can act if move OR attack is available
 
-    def get_possible_targets(self, players, game_map):
-        """Find all enemy units this unit could potentially attack."""
-        if "Stun" in self.status_effects: return [] # Cannot target if stunned
+    def get_possible_targets(self, players, game_map, visible_enemies=None):
+        """Find all enemy units this unit could potentially attack.
+        visible_enemies: optional list of living enemies already known to be visible to this
+        unit's player (e.g. Game.get_visible_enemies), which skips the alive/visibility checks.
+        Without it the result is reused until the unit, its attack range or any unit on the map
+        changes (visibility only changes with those too); callers must not mutate the list."""
+        if self.is_stunned: return [] # Cannot target if stunned
 
         targets = []
-        # Find opponent based on self.player object reference
-        opponent = None
-        for p in players:
-            if p != self.player:
-                opponent = p
-                break
-        if not opponent: return [] # Should not happen in 2-player game
-
-        for enemy_unit in opponent.get_alive_units():
-             # Visibility check should happen *before* calling can_attack ideally,
-             # but can_attack includes the Line of Sight check
-             # We need visibility from the *attacking player's* perspective
-             is_visible_to_attacker = self.player.visibility_map[enemy_unit.position[1]][enemy_unit.position[0]] == 2
-             if is_visible_to_attacker and self.can_attack(enemy_unit, game_map):
-                  targets.append(enemy_unit)
+        cache_key = None
+        if visible_enemies is None:
+            cache_key = (game_map, game_map.occupancy_version, self.position, self.effective_attack_range)
+            cached = self._possible_targets_cache
+            if cached is not None and cached[0] == cache_key:
+                return cached[1]
+            # Find opponent based on self.player object reference
+            opponent = None
+            for p in players:
+                if p != self.player:
+                    opponent = p
+                    break
+            if not opponent: return [] # Should not happen in 2-player game
+            candidates = opponent.units
+            visibility_map = self.player.visibility_map # Visibility from the *attacking player's* perspective
+        else:
+            candidates = visible_enemies
+            visibility_map = None
+
+        # Same rules as can_attack, but cheapest checks first and without its log output:
+        # range (plain arithmetic) -> visibility -> line of sight
+        ux, uy = self.position
+        attack_range = self.effective_attack_range
+        check_los = self.attack_range > 1
+        for enemy_unit in candidates:
+             if not enemy_unit.is_alive:
+                  continue
+             ex, ey = enemy_unit.position
+             dist = abs(ex - ux) + abs(ey - uy)
+             if dist > attack_range:
+                  continue
+             if visibility_map is not None and visibility_map[ey * MAP_WIDTH + ex] != 2:
+                  continue
+             if check_los and dist > 1 and not has_line_of_sight(game_map, self.position, enemy_unit.position):
+                  continue
+             targets.append(enemy_unit)
+        if cache_key is not None:
+            self._possible_targets_cache = (cache_key, targets)
         return targets
 
     def __str__(self):
         status_list = []
-        if "Stun" in self.status_effects:
+        if self.is_stunned:
             status_list.append(STATUS_EFFECTS_INFO["Stun"]["symbol"])
         else:
             if not self.has_moved: status_list.append("Mv")
@@ -673,6 +701,101 @@ class Unit:
                 f"Actions: {','.join(status_list) if status_list else 'Done'}")
 
 
+# --- Ability Handlers ---
+# Each takes (unit, target, game) and returns True if the ability took effect.
+# On False, Unit.use_ability refunds the cooldown and action flags.
+def _ability_bash(unit, target, game): # Warrior - Target adjacent enemy
+    if isinstance(target, Unit) and target.player != unit.player and target.is_alive:
+        if distance(unit.position, target.position) == 1:
+            log.info("  Bashes %s (ID: %s)!", target.type, target.id)
+            target.apply_status("Stun", 1) # Stun for 1 turn duration
+            # Maybe deal small damage too?
+            # target.take_damage(unit.attack // 2, attacker=unit)
+            return True
+        log.info("  Target is not adjacent.")
+    else:
+        log.info("  Invalid target for Bash (must be living adjacent enemy unit).")
+    return False
+
+def _ability_long_shot(unit, target, game): # Archer - Self-buff affecting the next attack
+    unit.ability_active_timer = 1 + 1 # Activate for this action phase + next turn start decrement
+    unit._refresh_effective_stats()
+    log.info("  Taking careful aim for the next shot (increased range).")
+    # The range check happens in can_attack. Doesn't consume attack action itself.
+    unit.has_attacked = False # Activating buff doesn't count as attack
+    return True
+
+def _ability_charge(unit, target, game): # Cavalry - Activate for bonus move this turn
+    unit.apply_status("Charge", 1) # Apply Charge status for 1 turn
+    log.info("  Preparing to charge! (Increased move range this turn)")
+    # Doesn't consume attack action itself.
+    unit.has_attacked = False # Activating buff doesn't count as attack
+    return True
+
+def _ability_fireball(unit, target, game): # Mage - Area Effect, now applies Poison chance
+    game_map = game.map
+    if not (isinstance(target, tuple) and game_map.is_valid_coordinate(target)):
+        log.info("  Invalid target position for Fireball.")
+        return False
+    if distance(unit.position, target) > unit.attack_range:
+        log.info("  Target position %s is out of range (%s).", target, unit.attack_range)
+        return False
+
+    aoe_radius = 1 # Tiles around target (Manhattan distance, to match movement/range)
+    log.info("  Casting Fireball at %s!", target)
+    affected_units = []
+    tx, ty = target
+    width, height = game_map.width, game_map.height
+    unit_blocked = game_map.unit_blocked # Nonzero exactly where a living unit stands
+    for dx, dy in manhattan_disk(aoe_radius):
+        x, y = tx + dx, ty + dy
+        if 0 <= x < width and 0 <= y < height and unit_blocked[y * width + x]:
+            # AoE often hits friendlies too! Be careful.
+            # if unit_on_tile.player != unit.player: # Uncomment to avoid friendly fire
+            affected_units.append(game_map.flat_tiles[y * width + x].unit)
+
+    if not affected_units: log.info("  ...but hit nothing.")
+    fireball_damage = unit.attack + 2 # Fireball deals slightly more damage
+    poison_chance = 0.3 # 30% chance to poison
+
+    for hit_unit in affected_units:
+        log.info("  Hit %s's %s!", hit_unit.player.name, hit_unit.type)
+        hit_unit.take_damage(fireball_damage, attacker=unit) # Pass caster for XP gain
+        # Apply poison chance
+        if hit_unit.is_alive and random.random() < poison_chance:
+            log.info("  %s is Poisoned!", hit_unit.type)
+            hit_unit.apply_status("Poison", 3) # Poison for 3 turns
+    return True
+
+def _ability_heal(unit, target, game): # Healer
+    if isinstance(target, Unit) and target.is_alive and target.player == unit.player:
+        if distance(unit.position, target.position) <= unit.attack_range: # Heal needs range check
+            heal_amount = 10 + unit.level # Healing scales slightly with level
+            actual_healed = min(heal_amount, target.max_hp - target.hp) # Cannot heal above max HP
+            target.hp += actual_healed
+            log.info("  Healed %s (ID: %s) for %s HP. (Current: %s/%s)", target.type, target.id, actual_healed, target.hp, target.max_hp)
+            return True
+        log.info("  Target %s is out of range.", target.type)
+    else:
+        log.info("  Invalid target for Heal (must be living friendly unit in range).")
+    return False
+
+def _ability_evade(unit, target, game): # Scout - Self buff
+    unit.apply_status("Evade", unit.ability_duration) # Use status effect system
+    log.info("  Using evasive maneuvers! (Defense increased)")
+    unit.has_attacked = False # Activating buff doesn't count as attack
+    return True
+
+ABILITY_HANDLERS = {
+    "Bash": _ability_bash,
+    "Long Shot": _ability_long_shot,
+    "Charge": _ability_charge,
+    "Fireball": _ability_fireball,
+    "Heal": _ability_heal,
+    "Evade": _ability_evade,
+}
+
+
 # --- Player Class ---
 class Player:
     def __init__(self, id, name, game, is_ai=False, base_position=(0,0)):
@@ -684,26 +807,35 @@ class Player:
         self.gold = INITIAL_GOLD
         self.next_unit_id_counter = 1 # Unique IDs within the player
         self.base_unit = None # Reference to the player's Base unit
+        self._alive_units = None # Cached get_alive_units() result, None = rebuild on next call
         self._create_base(base_position)
-        # Fog of War: 2D array matching map, stores visibility state
+        # Fog of War: flat per-tile array matching map, the only store of visibility state (display reads it)
         # 0 = Undiscovered, 1 = Discovered (but not visible), 2 = Currently Visible
-        self.visibility_map = [[0 for _ in range(MAP_WIDTH)] for _ in range(MAP_HEIGHT)]
+        self.visibility_map = bytearray(MAP_WIDTH * MAP_HEIGHT) # index y * MAP_WIDTH + x
+        self._vision_count = None # Per tile: how many living units see it (None = rebuild via update_visibility)
 
 
+    def __getstate__(self):
+        # Saved without the caches; get_alive_units and the next visibility update rebuild them
+        state = self.__dict__.copy()
+        state["_alive_units"] = state["_vision_count"] = None
+        return state
+
     def _create_base(self, position):
          base_stats = UNIT_STATS["Base"]
          unit_id = f"{self.id}-{self.next_unit_id_counter}"
          self.next_unit_id_counter += 1
          self.base_unit = Unit(unit_id, self, "Base", position, base_stats)
          self.units.append(self.base_unit)
+         self._alive_units = None
          if self.game.map.is_valid_coordinate(position):
              # Make sure base tile type matches if needed, or force place
              base_tile = self.game.map.get_tile(position)
              if base_tile:
                   # base_tile.terrain_key = "B" # Optional: change terrain under base
                   # base_tile.terrain_info = TERRAIN_TYPES["B"]
-                  # base_tile.symbol = TERRAIN_TYPES["B"]["symbol"]
-                  base_tile.unit = self.base_unit
+                  # base_tile.symbol = TERRAIN_TYPES["B"].symbol
+                  self.game.map.place_unit(self.base_unit, position)
              else: print(f"Warning: Base position {position} invalid on map.")
          else: print(f"Warning: Base position {position} out of bounds.")
 
@@ -729,6 +861,7 @@ class Player:
         unit_id = self.get_next_unit_id()
         unit = Unit(unit_id, self, unit_type, position, stats)
         self.units.append(unit)
+        self._alive_units = None
         self.game.map.place_unit(unit, position)
         print(f"{self.name} placed {unit_type} (ID: {unit.id}) at {position}.")
         return unit
@@ -740,11 +873,11 @@ class Player:
         if unit_type not in UNIT_STATS:
              print(f"{self.name}: Unknown unit type '{unit_type}'")
              return False
-        if UNIT_STATS[unit_type]["cost"] == 0: # Cannot build Bases directly
+        if UNIT_STATS[unit_type].cost == 0: # Cannot build Bases directly
              print(f"{self.name}: Cannot build {unit_type}.")
              return False
 
-        cost = UNIT_STATS[unit_type]["cost"]
+        cost = UNIT_STATS[unit_type].cost
         if self.gold < cost:
              print(f"{self.name}: Cannot build {unit_type}. Need {cost} gold, have {self.gold}.")
              return False
@@ -752,7 +885,7 @@ class Player:
         # Find valid adjacent spot to place unit
         spawn_pos = None
         base_pos = self.base_unit.position
-        for dx, dy in [(0, 1), (0, -1), (1, 0), (-1, 0), (1,1), (1,-1), (-1,1), (-1,-1)]: # Check adjacent tiles
+        for dx, dy in _NEIGHBORS8: # Check adjacent tiles
             check_pos = (base_pos[0] + dx, base_pos[1] + dy)
             if self.game.map.is_valid_coordinate(check_pos):
                  tile = self.game.map.get_tile(check_pos)
@@ -782,14 +915,19 @@ class Player:
     def collect_income(self):
          turn_income = GOLD_PER_TURN # Base income
          mine_income = 0
-         for unit in self.get_alive_units():
+         income_grid = self.game.map.income_grid
+         width = self.game.map.width
+         for unit in self.units:
+             if not unit.is_alive:
+                 continue
              # Check if unit is on a Gold Mine tile
-             tile = self.game.map.get_tile(unit.position)
-             if tile and tile.provides_income > 0:
+             x, y = unit.position
+             tile_income = income_grid[y * width + x]
+             if tile_income > 0:
                   # Maybe require unit to 'wait' or 'garrison' on the tile?
                   # Simple version: just being on it provides income
-                  mine_income += tile.provides_income
-                  print(f"  +{tile.provides_income} gold from {unit.type} on Gold Mine.")
+                  mine_income += tile_income
+                  print(f"  +{tile_income} gold from {unit.type} on Gold Mine.")
 
          total_income = turn_income + mine_income
          self.gold += total_income
@@ -798,79 +936,57 @@ class Player:
 
     def update_visibility(self):
         """Recalculates the player's visibility map based on unit positions."""
-        # 1. Reset currently visible tiles (but keep discovered ones)
-        for y in range(MAP_HEIGHT):
-            for x in range(MAP_WIDTH):
-                if self.visibility_map[y][x] == 2: # If currently visible
-                    self.visibility_map[y][x] = 1 # Mark as discovered but not visible now
-                # Also reset visibility flag on the tile itself (for player 1 perspective)
-                if self.id == 0:
-                    self.game.map.tiles[y][x].is_visible = False
-
-        # 2. Calculate new visibility using BFS from each unit
+        # 1. Demote currently visible tiles to discovered (2 -> 1) in one pass over the flat map
+        vis = self.visibility_map
+        vis[:] = vis.translate(_DEMOTE_VISIBLE)
+
+        # 2. Mark every tile inside each unit's vision footprint (cached per position/range on the map),
+        #    counting viewers per tile so a single move can be applied incrementally later
+        get_footprint = self.game.map.get_vision_footprint
+        counts = self._vision_count = [0] * len(vis)
         for unit in self.get_alive_units():
-            q = [(unit.position, 0)] # (position, vision_cost_spent)
-            visited_for_unit = {unit.position} # Avoid cycles for this unit's vision
-
-            # Mark unit's own tile as visible
-            ux, uy = unit.position
-            if 0 <= uy < MAP_HEIGHT and 0 <= ux < MAP_WIDTH: # Bounds check
-                self.visibility_map[uy][ux] = 2
-                if self.id == 0: # Only update tile properties for player 1's view
-                    self.game.map.tiles[uy][ux].is_visible = True
-                    self.game.map.tiles[uy][ux].is_discovered = True
-
-            while q:
-                curr_pos, cost_spent = q.pop(0)
-
-                # Vision range check: <= allows seeing tile exactly AT vision range limit
-                if cost_spent >= unit.vision_range:
-                    continue
-
-                # Explore neighbors (including diagonals for vision)
-                for dx, dy in [(0, 1), (0, -1), (1, 0), (-1, 0), (1,1), (1,-1), (-1,1), (-1,-1)]:
-                    next_x, next_y = curr_pos[0] + dx, curr_pos[1] + dy
-                    next_pos = (next_x, next_y)
-
-                    if not self.game.map.is_valid_coordinate(next_pos):
-                        continue
-
-                    if next_pos in visited_for_unit:
-                         continue
-
-                    next_tile = self.game.map.get_tile(next_pos)
-                    vision_cost = next_tile.vision_cost # Terrain affects vision cost
-                    new_cost = cost_spent + vision_cost
-
-                    # Allow vision into tiles even if cost exceeds range, but don't spread from them
-                    if new_cost <= unit.vision_range:
-                         visited_for_unit.add(next_pos)
-                         # Mark tile as visible (2) and discovered
-                         self.visibility_map[next_y][next_x] = 2
-                         # Update tile directly FOR PLAYER 1 VIEW ONLY
-                         if self.id == 0:
-                              self.game.map.tiles[next_y][next_x].is_visible = True
-                              self.game.map.tiles[next_y][next_x].is_discovered = True
-
-                         # Only continue spreading vision if terrain doesn't completely block?
-                         # Current model allows seeing *past* blocking terrain if range permits, which is simpler.
-                         # Add the neighbor to the queue to explore from it
-                         q.append((next_pos, new_cost))
-                    # Allow seeing the tile *at* the edge of vision range even if its cost pushes over
-                    # But don't spread vision *from* it if it's over budget
-                    elif cost_spent < unit.vision_range and new_cost > unit.vision_range:
-                         # Can see this tile, but cannot see past it
-                         if next_pos not in visited_for_unit: # Avoid marking already visited tiles again
-                            visited_for_unit.add(next_pos)
-                            self.visibility_map[next_y][next_x] = 2
-                            if self.id == 0:
-                                self.game.map.tiles[next_y][next_x].is_visible = True
-                                self.game.map.tiles[next_y][next_x].is_discovered = True
-                         # Do not add to q
+            for idx in get_footprint(unit.position, unit.vision_range):
+                vis[idx] = 2
+                counts[idx] += 1
+
+    def update_visibility_after_move(self, unit, old_pos):
+        """Applies one unit's move to the visibility map: drops its old footprint, adds the new one.
+        Same result as update_visibility(), which it falls back to if the viewer counts are stale."""
+        counts = self._vision_count
+        if counts is None or not unit.is_alive:
+            self.update_visibility()
+            return
+        vis = self.visibility_map
+        game_map = self.game.map
+        old_footprint = game_map.get_vision_footprint(old_pos, unit.vision_range)
+        new_footprint = game_map.get_vision_footprint(unit.position, unit.vision_range)
+        for idx in old_footprint:
+            counts[idx] -= 1
+            if counts[idx] == 0:
+                vis[idx] = 1 # Discovered, no longer seen by anyone
+        for idx in new_footprint:
+            counts[idx] += 1
+            vis[idx] = 2
+
+    def refresh_visibility(self):
+        """Rebuilds the visibility map only if one of this player's units died since the last update.
+        Vision ranges never change and moves are applied by update_visibility_after_move, so a loss
+        (which clears the viewer counts) is the only thing that can leave the map stale."""
+        if self._vision_count is None:
+            self.update_visibility()
 
 
     def get_alive_units(self):
-        return [u for u in self.units if u.is_alive]
+        """Living units, cached until a unit is added or dies. Callers must not mutate the list."""
+        if self._alive_units is None:
+            self._alive_units = [u for u in self.units if u.is_alive]
+        return self._alive_units
+
+    def unit_died(self, unit):
+        self._alive_units = None # Rebuilt on next get_alive_units()
+        self._vision_count = None # Dead unit no longer sees; next update is a full rebuild
+        if unit is self.base_unit:
+            self.game.base_destroyed(self)
 
     def has_units_left(self):
         # Win condition might be destroying the Base
@@ -898,7 +1014,52 @@ class GameMap:
     def __init__(self, width, height, terrain_layout):
         self.width = width
         self.height = height
-        self.tiles = self._create_map(terrain_layout)
+        self.tiles = self._create_map(terrain_layout) # Rows of tiles, tiles[y][x]
+        self.unit_blocked = bytearray(width * height) # 1 = living unit on tile
+        self.occupancy_version = 0 # Bumped whenever unit_blocked changes (keys Unit.get_valid_moves cache)
+        self.units_by_id = {} # unit id -> Unit, for every unit ever placed (see find_unit)
+        self._build_lookup_tables()
+
+    # Game state that is saved; everything else is derived from the tiles by _build_lookup_tables
+    _SAVED_FIELDS = ("width", "height", "tiles", "unit_blocked", "occupancy_version", "units_by_id")
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self._SAVED_FIELDS}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._build_lookup_tables()
+
+    def _build_lookup_tables(self):
+        """Flat grids, neighbor tables, caches and search buffers derived from the (static) terrain."""
+        width, height = self.width, self.height
+        # The same Tile objects in one flat list, plus flat per-tile lookup grids
+        # (index = y * width + x) for pathfinding/combat hot loops
+        self.flat_tiles = [tile for row in self.tiles for tile in row]
+        self.terrain_key_grid = [tile.terrain_key for tile in self.flat_tiles]
+        self.move_cost_grid = [tile.move_cost for tile in self.flat_tiles]
+        self.defense_bonus_grid = [tile.defense_bonus for tile in self.flat_tiles]
+        self.income_grid = [tile.provides_income for tile in self.flat_tiles]
+        self.vision_cost_grid = [tile.vision_cost for tile in self.flat_tiles]
+        self.blocks_los_grid = bytes(TERRAIN_BLOCKS_LOS[key] for key in self.terrain_key_grid) # 1 = blocks line of sight
+        self.padded_move_cost_grid = pad_grid(self.move_cost_grid, width, height) # None border, for A*
+        # Display glyph per tile for each visibility state: (undiscovered, discovered fog, visible).
+        # Terrain never changes, so rendering is a lookup by visibility_map value.
+        self.state_glyphs = [(" ", tile.symbol.lower(), tile.symbol) for tile in self.flat_tiles]
+        # In-bounds neighbors of every tile as (flat index, position) pairs, in _NEIGHBORS4/_NEIGHBORS8 order
+        self.neighbors4 = self._neighbor_table(_NEIGHBORS4)
+        self.neighbors8 = self._neighbor_table(_NEIGHBORS8)
+        self._vision_footprints = {} # (position, vision_range) -> flat indices of tiles visible from there
+        self._search_marker = bytearray((width + 2) * (height + 2)) # Reusable closed/seen set for A* (padded indices) and move search, see begin_search
+        self._search_cost = [0] * (width * height) # Per-tile cost scratch for get_valid_moves, valid where marker == gen
+        self._search_gen = 0
+
+    def _neighbor_table(self, offsets):
+        width, height = self.width, self.height
+        return [tuple((ny * width + nx, (nx, ny))
+                      for nx, ny in ((x + dx, y + dy) for dx, dy in offsets)
+                      if 0 <= nx < width and 0 <= ny < height)
+                for y in range(height) for x in range(width)]
 
     def _create_map(self, terrain_layout):
         if len(terrain_layout) != self.height or any(len(row) != self.width for row in terrain_layout):
@@ -917,49 +1078,122 @@ class GameMap:
     # --- Modified for Highlighting ---
     def display(self, player1_pov, highlight_move=None, highlight_attack=None): # Pass the player whose POV we are showing
         """Displays the map from the perspective of Player 1 (Human)"""
+        print("\n".join(self.render_lines(player1_pov, highlight_move, highlight_attack)))
 
-        # Reset highlights from previous display
-        for y in range(self.height):
-            for x in range(self.width):
-                self.tiles[y][x].highlight_move = False
-                self.tiles[y][x].highlight_attack = False
+    def render_lines(self, player1_pov, highlight_move=None, highlight_attack=None):
+        """Builds the map display (Player 1's POV) as a list of lines, so callers can write a frame at once."""
 
-        # Apply new highlights (respecting FoW for player 1)
+        # Highlight marks for this frame only, one byte per tile: 0 = none, 1 = move, 2 = attack
+        # (respecting FoW for player 1)
+        vis = player1_pov.visibility_map
+        marks = bytearray(self.width * self.height)
         if highlight_move:
             for pos in highlight_move:
-                if self.is_valid_coordinate(pos) and player1_pov.visibility_map[pos[1]][pos[0]] > 0: # Check discovered or visible
-                     self.tiles[pos[1]][pos[0]].highlight_move = True
+                if self.is_valid_coordinate(pos) and vis[pos[1] * MAP_WIDTH + pos[0]] > 0: # Check discovered or visible
+                     marks[pos[1] * self.width + pos[0]] = 1
         if highlight_attack:
             for pos in highlight_attack:
-                 if self.is_valid_coordinate(pos) and player1_pov.visibility_map[pos[1]][pos[0]] == 2: # Must be currently visible to highlight attack target
-                      self.tiles[pos[1]][pos[0]].highlight_attack = True # Attack highlight overrides move
+                 if self.is_valid_coordinate(pos) and vis[pos[1] * MAP_WIDTH + pos[0]] == 2: # Must be currently visible to highlight attack target
+                      marks[pos[1] * self.width + pos[0]] = 2 # Attack highlight overrides move
 
 
-        print("    " + " ".join(f"{i:<2}" for i in range(self.width))) # Column numbers
-        print("  +" + "--" * self.width + "-+")
+        lines = ["    " + " ".join(f"{i:<2}" for i in range(self.width))] # Column numbers
+        border = "  +" + "--" * self.width + "-+"
+        lines.append(border)
+        state_glyphs = self.state_glyphs
         for y in range(self.height):
-            row_str = f"{y:<2}|" # Row number
-            for x in range(self.width):
-                # Use the tile's display method which checks visibility & highlighting
-                tile = self.tiles[y][x]
-                display_char = tile.display(player_perspective=True) # Always use P1 perspective for display
-                row_str += " " + display_char
-            row_str += " |"
-            print(row_str)
-        print("  +" + "--" * self.width + "-+")
-        print("Legend: . = Plains, ^ = Mtn, # = Forest, G = Mine, B = Base")
-        print("        * = Move Range, ! = Attack Range (lowercase = discovered fog)")
-        print("Units: Player 1 (UPPERCASE), Player 2 AI (lowercase)")
-        print("Status: (P)Poison (S)Stun (E)Evade (Ch)Charge (SW)ShieldWall")
-
+            # Same rules as Tile.display(vis_state, highlight): highlight, then visible unit, then terrain glyph by state
+            chars = []
+            idx = y * self.width
+            for tile in self.tiles[y]:
+                state = vis[idx]
+                mark = marks[idx]
+                if mark == 2: chars.append("!")
+                elif mark == 1: chars.append("*")
+                elif state == 2 and tile.unit and tile.unit.is_alive:
+                    # Unit symbol, uppercase for Player 1, lowercase for the enemy
+                    unit = tile.unit
+                    chars.append(unit.symbol.upper() if unit.player.id == 0 else unit.symbol.lower())
+                else:
+                    chars.append(state_glyphs[idx][state])
+                idx += 1
+            lines.append(f"{y:<2}| {' '.join(chars)} |") # Row number
+        lines.append(border)
+        lines.append("Legend: . = Plains, ^ = Mtn, # = Forest, G = Mine, B = Base")
+        lines.append("        * = Move Range, ! = Attack Range (lowercase = discovered fog)")
+        lines.append("Units: Player 1 (UPPERCASE), Player 2 AI (lowercase)")
+        lines.append("Status: (P)Poison (S)Stun (E)Evade (Ch)Charge (SW)ShieldWall")
+        return lines
+
+
+    def begin_search(self):
+        """Returns (marker, gen) for a fresh closed set: a tile is closed when marker[y * width + x] == gen.
+        Bumping the generation clears the set without touching the array (reset only on byte overflow)."""
+        self._search_gen += 1
+        if self._search_gen > 255:
+            self._search_marker = bytearray((self.width + 2) * (self.height + 2))
+            self._search_gen = 1
+        return self._search_marker, self._search_gen
+
+    def get_vision_footprint(self, pos, vision_range):
+        """Flat indices of tiles visible from pos. Depends only on (static) terrain, so each result is computed once."""
+        key = (pos, vision_range)
+        footprint = self._vision_footprints.get(key)
+        if footprint is None:
+            footprint = self._vision_footprints[key] = self._compute_vision_footprint(pos, vision_range)
+        return footprint
+
+    def _compute_vision_footprint(self, pos, vision_range):
+        """Dijkstra outwards from pos, spending each tile's vision_cost. Returns a tuple of flat tile indices (y * width + x).
+        Tiles spread vision from their cheapest cost, so a costly first route can't cut the footprint short."""
+        if not self.is_valid_coordinate(pos):
+            return ()
+        width, height = self.width, self.height
+        neighbors8 = self.neighbors8
+        vision_cost_grid = self.vision_cost_grid
+        # Best cost per tile lives in the reusable search buffers (valid where seen[idx] == gen);
+        # a scratch byte per tile records membership while the footprint list keeps discovery order
+        seen, gen = self.begin_search()
+        best_cost = self._search_cost
+        in_footprint = bytearray(width * height)
+        footprint = []
+        start_idx = pos[1] * width + pos[0]
+        seen[start_idx] = gen
+        best_cost[start_idx] = 0
+        in_footprint[start_idx] = 1 # Own tile is always visible
+        footprint.append(start_idx)
+        heap = [(0, pos, start_idx)] # (vision_cost_spent, position, flat index)
+
+        while heap:
+            cost_spent, _, curr_idx = heapq.heappop(heap)
+            if cost_spent > best_cost[curr_idx]:
+                continue # Stale entry, already expanded at a lower cost
+
+            # Explore neighbors (including diagonals for vision; precomputed, already inside the map)
+            for idx, next_pos in neighbors8[curr_idx]:
+                # Tile is visible either way; a neighbour of a tile still under budget can always be seen
+                if not in_footprint[idx]:
+                    in_footprint[idx] = 1
+                    footprint.append(idx)
+
+                # Allow vision into tiles even if cost exceeds range, but don't spread from them
+                # Current model allows seeing *past* blocking terrain if range permits, which is simpler.
+                new_cost = cost_spent + vision_cost_grid[idx] # Terrain affects vision cost
+                if new_cost < vision_range and (seen[idx] != gen or new_cost < best_cost[idx]):
+                     seen[idx] = gen
+                     best_cost[idx] = new_cost
+                     heapq.heappush(heap, (new_cost, next_pos, idx))
+
+        return tuple(footprint)
 
     def is_valid_coordinate(self, pos):
         x, y = pos
         return 0 <= x < self.width and 0 <= y < self.height
 
     def get_tile(self, pos):
-        if self.is_valid_coordinate(pos):
-            return self.tiles[pos[1]][pos[0]]
+        x, y = pos
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.flat_tiles[y * self.width + x]
         return None
 
     def get_unit_at(self, pos, check_visibility=True, asking_player=None):
@@ -969,7 +1203,7 @@ class GameMap:
             if unit and unit.is_alive:
                 # If checking visibility, ensure the asking_player (usually P1) can see it
                 if check_visibility and asking_player:
-                    if asking_player.visibility_map[pos[1]][pos[0]] == 2: # Currently visible
+                    if asking_player.visibility_map[pos[1] * MAP_WIDTH + pos[0]] == 2: # Currently visible
                         return unit
                     else:
                         return None # Unit present but not visible
@@ -978,6 +1212,11 @@ class GameMap:
         return None
 
 
+    def find_unit(self, unit_id):
+        """Living unit with the given ID (either player), or None."""
+        unit = self.units_by_id.get(unit_id)
+        return unit if unit and unit.is_alive else None
+
     def get_terrain_key(self, pos):
          tile = self.get_tile(pos)
          return tile.terrain_key if tile else None
@@ -990,6 +1229,9 @@ class GameMap:
             if not tile.unit or not tile.unit.is_alive:
                 tile.unit = unit
                 unit.position = pos
+                self.unit_blocked[pos[1] * self.width + pos[0]] = 1 if unit.is_alive else 0
+                self.occupancy_version += 1
+                self.units_by_id[unit.id] = unit
             else:
                 print(f"Error: Cannot place unit at {pos}, already occupied by {tile.unit.type}")
 
@@ -999,18 +1241,151 @@ class GameMap:
              tile = self.get_tile(unit.position)
              if tile.unit == unit:
                   tile.unit = None
+                  self.unit_blocked[unit.position[1] * self.width + unit.position[0]] = 0
+                  self.occupancy_version += 1
          # The unit object might still exist in the player's list until pruned,
          # but setting is_alive to False is the primary check.
 
     def move_unit(self, unit, new_pos):
         if self.is_valid_coordinate(unit.position):
             self.get_tile(unit.position).unit = None # Clear old tile
+            self.unit_blocked[unit.position[1] * self.width + unit.position[0]] = 0
+            self.occupancy_version += 1
         self.place_unit(unit, new_pos) # Place on new tile
 
+    def unit_died(self, unit):
+         # Dead units may stay on their tile (e.g. destroyed Base) but no longer block it
+         if self.is_valid_coordinate(unit.position):
+             self.unit_blocked[unit.position[1] * self.width + unit.position[0]] = 0
+             self.occupancy_version += 1
+
+
+# --- Unit Commands (human input) ---
+# Target kind each ability command expects
+POSITION_TARGET_ABILITIES = frozenset({"Fireball"})
+UNIT_TARGET_ABILITIES = frozenset({"Heal", "Bash"})
+TARGETED_ABILITIES = POSITION_TARGET_ABILITIES | UNIT_TARGET_ABILITIES # Add other targeted abilities
+SELF_CAST_ABILITIES = frozenset({"Evade", "Charge", "Long Shot"}) # Self-cast or passive activation
+
+# Each handler takes the game, the selected unit and the tokenized command and
+# returns an action tuple for get_unit_action, or None to re-prompt.
+def _command_move(game, unit, parts):
+    if unit.has_moved or unit.is_stunned:
+        print(f"{unit.type} (ID: {unit.id}) cannot move (already moved or stunned).")
+        return None
+    if len(parts) == 3 and parts[1].isdigit() and parts[2].isdigit():
+        target_pos = (int(parts[1]), int(parts[2]))
+
+        # Check if target position is within calculated valid moves
+        valid_moves = unit.get_valid_moves(game.map)
+        if target_pos in valid_moves:
+            # Check if destination is occupied *just before* moving
+            dest_tile = game.map.get_tile(target_pos)
+            if dest_tile.unit and dest_tile.unit.is_alive:
+                print(f"Cannot move to {target_pos}. Destination occupied.")
+            else:
+                return ("move", target_pos)
+        else:
+            print(f"Cannot move to {target_pos}. Not within move range or path blocked.")
+    else:
+        print("Invalid move command. Use: move [x] [y]")
+    return None
+
+def _command_attack(game, unit, parts):
+    if unit.has_attacked or unit.is_stunned:
+        print(f"{unit.type} (ID: {unit.id}) cannot attack (already attacked or stunned).")
+        return None
+    if len(parts) != 2:
+        print("Invalid attack command. Use: attack [target_unit_id] (e.g., attack 1-1)")
+        return None
+    target_id_str = parts[1]
+    target_unit = game.map.find_unit(target_id_str)
+    if target_unit and target_unit.player != game.get_opponent():
+        target_unit = None
+    if not target_unit:
+        print(f"Invalid or non-visible enemy unit ID: {target_id_str}")
+        return None
+
+    # Important: Check visibility for attack command from Player 1's perspective
+    if game.player1.visibility_map[target_unit.position[1] * MAP_WIDTH + target_unit.position[0]] != 2:
+        print(f"Cannot target unit {target_id_str}. Not currently visible.")
+        return None
+    if unit.can_attack(target_unit, game.map):
+        return ("attack", target_unit)
+    print(f"Cannot attack {target_unit.type} (ID: {target_id_str}). Out of range or line of sight blocked.")
+    return None
+
+def _command_ability(game, unit, parts):
+    if unit.is_stunned:
+        print(f"{unit.type} (ID: {unit.id}) cannot use ability (stunned).")
+        return None
+    if unit.has_used_ability:
+        print(f"{unit.type} (ID: {unit.id}) has already used an ability this turn.")
+        return None
+    if not unit.can_use_ability():
+        print(f"Ability '{unit.ability_name}' is on cooldown ({unit.ability_cooldown_timer} turns).")
+        return None
+    target_data = None # For ability target (unit ID, position, or None)
+
+    # Determine required target type based on ability
+    ability_needs_target = unit.ability_name in TARGETED_ABILITIES
+    ability_needs_pos = unit.ability_name in POSITION_TARGET_ABILITIES
+    ability_needs_unit = unit.ability_name in UNIT_TARGET_ABILITIES
+    ability_is_self = unit.ability_name in SELF_CAST_ABILITIES
+
+    if ability_needs_target:
+        if len(parts) < 2 and not ability_is_self: # Need target unless self-cast
+            print(f"Ability '{unit.ability_name}' requires a target. Use: ability [target_id/x y]")
+            return None
+
+        if ability_needs_pos and len(parts) == 3 and parts[1].isdigit() and parts[2].isdigit():
+            target_data = (int(parts[1]), int(parts[2])) # Position tuple
+            if distance(unit.position, target_data) > unit.attack_range:
+                print(f"Target position {target_data} is out of range ({unit.attack_range}).")
+                return None
+        elif ability_needs_unit and len(parts) == 2:
+            target_id_str = parts[1]
+            # Find unit (can be friendly for Heal, enemy for Bash) - either player
+            found_target = game.map.find_unit(target_id_str)
+            if not found_target:
+                print(f"Invalid target ID for ability: {target_id_str}")
+                return None
+
+            # Visibility check if targeting enemy
+            if found_target.player != game.get_current_player():
+                if game.player1.visibility_map[found_target.position[1] * MAP_WIDTH + found_target.position[0]] != 2:
+                    print(f"Cannot target unit {target_id_str}. Not currently visible.")
+                    return None
+
+            # Range check for unit-targeted abilities (e.g., Bash is range 1)
+            req_range = 1 if unit.ability_name == "Bash" else unit.attack_range
+            if distance(unit.position, found_target.position) > max(req_range, unit.attack_range):
+                print(f"Target unit {target_id_str} is out of ability range ({req_range}).")
+                return None
+            target_data = found_target # Unit object
+        elif ability_is_self and len(parts) == 1:
+            target_data = None # Explicitly None for self-cast
+        else: # Mismatched parameters
+            print(f"Invalid target format for '{unit.ability_name}'. Use ID, X Y, or no target as needed.")
+            return None
+    elif ability_is_self: # Self-cast or passive activation
+        if len(parts) > 1:
+            print(f"Ability '{unit.ability_name}' does not take parameters.")
+            return None
+        target_data = None # E.g., for Evade, Charge
+
+    return ("ability", target_data)
+
+UNIT_COMMAND_HANDLERS = {
+    "move": _command_move,
+    "attack": _command_attack,
+    "ability": _command_ability,
+}
+
 
 # --- Game Class ---
 class Game:
-    def __init__(self, map_layout):
+    def __init__(self, map_layout, interactive=True):
         self.map = GameMap(MAP_WIDTH, MAP_HEIGHT, map_layout)
         # Player IDs: 0 = Human, 1 = AI
         # Assign base positions here
@@ -1026,6 +1401,10 @@ class Game:
         self.players = [self.player1, self.player2]
         self.current_player_index = 0
         self.turn_number = 1
+        self._visible_enemies = None # get_visible_enemies cache, cleared whenever an action may change it
+        self.interactive = interactive # False for headless runs: no board redraw/Enter prompt before AI turns
+        self.ai_delay = 0.5 if interactive else 0 # Seconds to pause between AI actions; 0 for headless/automated runs
+        self._winner = None # Set by base_destroyed; read by check_win_condition
         self._setup_initial_units()
         # Calculate initial visibility AFTER units are placed
         self.player1.update_visibility()
@@ -1040,14 +1419,30 @@ class Game:
         self.player2.add_unit("Warrior", (MAP_WIDTH - 2, MAP_HEIGHT - 3))
         self.player2.add_unit("Archer", (MAP_WIDTH - 3, MAP_HEIGHT - 2))
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_visible_enemies"] = None # Cache, refilled by get_visible_enemies
+        return state
+
     def get_current_player(self):
         return self.players[self.current_player_index]
 
     def get_opponent(self):
          return self.players[1] if self.current_player_index == 0 else self.players[0]
 
+    def get_visible_enemies(self, player, opponent):
+        """Opponent's living units that player can currently see. Cached until the next action
+        (handle_action, build or turn change); callers must not mutate the list."""
+        cached = self._visible_enemies
+        if cached is None or cached[0] is not player:
+            vis = player.visibility_map
+            enemies = [e for e in opponent.get_alive_units() if vis[e.position[1] * MAP_WIDTH + e.position[0]] == 2]
+            cached = self._visible_enemies = (player, enemies)
+        return cached[1]
+
 
     def next_turn(self):
+        self._visible_enemies = None
         self.current_player_index = (self.current_player_index + 1) % len(self.players)
         new_player = self.get_current_player()
 
@@ -1062,8 +1457,8 @@ class Game:
     def display_game_state(self, selected_unit=None):
         clear_screen()
         current_player = self.get_current_player()
-        print(f"===== Turn {self.turn_number} - {current_player.name}'s Turn =====")
-        print(f"Gold: {self.player1.gold}") # Show human player's gold
+        lines = [f"===== Turn {self.turn_number} - {current_player.name}'s Turn =====",
+                 f"Gold: {self.player1.gold}"] # Show human player's gold
 
         # --- Prepare highlight data if unit selected ---
         highlight_moves = None
@@ -1074,29 +1469,30 @@ class Game:
             if not selected_unit.has_attacked:
                 # Get potential targets respecting player 1's visibility
                 targets = selected_unit.get_possible_targets(self.players, self.map)
-                highlight_attacks = {t.position for t in targets}
+                highlight_attacks = [t.position for t in targets] # Only iterated by render_lines; no set needed
         # ---------------------------------------------
 
-        self.map.display(self.player1, highlight_move=highlight_moves, highlight_attack=highlight_attacks) # Always display from Player 1's POV
+        lines.extend(self.map.render_lines(self.player1, highlight_move=highlight_moves, highlight_attack=highlight_attacks)) # Always display from Player 1's POV
 
-        print("\n--- Your Units (Player 1) ---")
+        lines.append("\n--- Your Units (Player 1) ---")
         for unit in sorted(self.player1.get_alive_units(), key=lambda u: u.id): # Sort for consistent order
              # Only show info the player should know
-             print(f"  {unit}") # Unit __str__ includes actions/cooldowns/status
+             lines.append(f"  {unit}") # Unit __str__ includes actions/cooldowns/status
 
         # Optionally show visible enemy units
-        print("\n--- Visible Enemy Units ---")
+        lines.append("\n--- Visible Enemy Units ---")
         visible_enemies = 0
         # Sort by ID for consistency
         sorted_enemy_units = sorted(self.player2.get_alive_units(), key=lambda u: u.id)
         for unit in sorted_enemy_units:
              # Check Player 1's visibility map
-             if self.player1.visibility_map[unit.position[1]][unit.position[0]] == 2:
+             if self.player1.visibility_map[unit.position[1] * MAP_WIDTH + unit.position[0]] == 2:
                  # Show basic info, including status effects player can see
                  status_str = "".join(STATUS_EFFECTS_INFO.get(eff, {}).get("symbol", "") for eff in unit.status_effects)
-                 print(f"  {unit.type} (ID:{unit.id}) at {unit.position} HP:?/{unit.max_hp} {status_str}") # Hide exact HP? Show status.
+                 lines.append(f"  {unit.type} (ID:{unit.id}) at {unit.position} HP:?/{unit.max_hp} {status_str}") # Hide exact HP? Show status.
                  visible_enemies +=1
-        if visible_enemies == 0: print("  None")
+        if visible_enemies == 0: lines.append("  None")
+        print("\n".join(lines)) # Write the whole frame at once
 
 
     def get_player_input(self):
@@ -1128,12 +1524,10 @@ class Game:
                 parts = command.split()
                 if len(parts) == 2:
                     unit_id_str = parts[1]
-                    selected_unit = None
-                    for unit in player.get_alive_units():
-                        # Match the full ID string (e.g., "0-1")
-                        if unit.id == unit_id_str and unit.type != "Base": # Cannot select base for actions
-                            selected_unit = unit
-                            break
+                    # Match the full ID string (e.g., "0-1")
+                    selected_unit = self.map.find_unit(unit_id_str)
+                    if selected_unit and (selected_unit.player != player or selected_unit.type == "Base"): # Cannot select base for actions
+                        selected_unit = None
                     if selected_unit:
                          if not selected_unit.can_act():
                               print(f"{selected_unit.type} (ID: {unit_id_str}) has no actions left or is stunned.")
@@ -1189,12 +1583,11 @@ class Game:
 
 
     def get_unit_action(self, unit):
-        player = self.get_current_player()
         while True:
             print(f"\nSelected: {unit}") # __str__ shows available actions
             options = []
-            can_move = not unit.has_moved and "Stun" not in unit.status_effects
-            can_attack = not unit.has_attacked and "Stun" not in unit.status_effects
+            can_move = not unit.has_moved and not unit.is_stunned
+            can_attack = not unit.has_attacked and not unit.is_stunned
             can_abil = unit.can_use_ability() and not unit.has_used_ability
 
             if can_move: options.append("move [x] [y]")
@@ -1207,6 +1600,8 @@ class Game:
             print(f"Unit actions: {', '.join(options)}")
 
             command = input(f"Enter action for {unit.type} (ID: {unit.id}): ").lower().strip()
+            parts = command.split()
+            verb = parts[0] if parts else ""
 
             if command == "cancel":
                  return ("cancel", None)
@@ -1220,183 +1615,60 @@ class Game:
                  self.show_unit_info(unit)
                  continue # Show info and re-prompt
 
-            # --- MOVE ---
-            elif command.startswith("move") and can_move:
-                 parts = command.split()
-                 if len(parts) == 3 and parts[1].isdigit() and parts[2].isdigit():
-                     x, y = int(parts[1]), int(parts[2])
-                     target_pos = (x, y)
-
-                     # Check if target position is within calculated valid moves
-                     valid_moves = unit.get_valid_moves(self.map) # Recalculate here? Or store? Recalc is safer.
-                     if target_pos in valid_moves:
-                         # Check if destination is occupied *just before* moving
-                         dest_tile = self.map.get_tile(target_pos)
-                         if dest_tile.unit and dest_tile.unit.is_alive:
-                              print(f"Cannot move to {target_pos}. Destination occupied.")
-                         else:
-                              return ("move", target_pos) # Return target position
-                     else:
-                         print(f"Cannot move to {target_pos}. Not within move range or path blocked.")
-                 else:
-                      print("Invalid move command. Use: move [x] [y]")
-
-            # --- ATTACK ---
-            elif command.startswith("attack") and can_attack:
-                 parts = command.split()
-                 if len(parts) == 2:
-                     target_id_str = parts[1]
-                     target_unit = None
-                     opponent = self.get_opponent()
-                     for u in opponent.get_alive_units():
-                          if u.id == target_id_str:
-                              target_unit = u
-                              break
-
-                     # Important: Check visibility for attack command from Player 1's perspective
-                     if target_unit:
-                          if not self.player1.visibility_map[target_unit.position[1]][target_unit.position[0]] == 2:
-                               print(f"Cannot target unit {target_id_str}. Not currently visible.")
-                               continue # Re-prompt
-
-                          if unit.can_attack(target_unit, self.map):
-                               return ("attack", target_unit)
-                          else:
-                               print(f"Cannot attack {target_unit.type} (ID: {target_id_str}). Out of range or line of sight blocked.")
-                     else:
-                          print(f"Invalid or non-visible enemy unit ID: {target_id_str}")
-                 else:
-                      print("Invalid attack command. Use: attack [target_unit_id] (e.g., attack 1-1)")
-
-            # --- ABILITY ---
-            elif command.startswith("ability") and can_abil:
-                 parts = command.split()
-                 target_data = None # For ability target (unit ID, position, or None)
-
-                 # Determine required target type based on ability
-                 ability_needs_target = unit.ability_name in ["Heal", "Bash", "Fireball"] # Add other targeted abilities
-                 ability_needs_pos = unit.ability_name in ["Fireball"]
-                 ability_needs_unit = unit.ability_name in ["Heal", "Bash"]
-                 ability_is_self = unit.ability_name in ["Evade", "Charge", "Long Shot"] # Self-cast or passive activation
-
-                 if ability_needs_target:
-                     if len(parts) < 2 and not ability_is_self: # Need target unless self-cast
-                          print(f"Ability '{unit.ability_name}' requires a target. Use: ability [target_id/x y]")
-                          continue
-
-                     if ability_needs_pos and len(parts) == 3 and parts[1].isdigit() and parts[2].isdigit():
-                          target_data = (int(parts[1]), int(parts[2])) # Position tuple
-                          # Add range check here? Or in use_ability? Let's do basic check here.
-                          if distance(unit.position, target_data) > unit.attack_range:
-                              print(f"Target position {target_data} is out of range ({unit.attack_range}).")
-                              continue
-                     elif ability_needs_unit and len(parts) == 2:
-                          target_id_str = parts[1]
-                          # Find unit (can be friendly for Heal, enemy for Bash)
-                          found_target = None
-                          # Check both players for the target ID
-                          for p in self.players:
-                              for u in p.get_alive_units():
-                                   if u.id == target_id_str:
-                                        found_target = u
-                                        break
-                              if found_target: break
-
-                          if found_target:
-                              # Visibility check if targeting enemy
-                              is_visible = True
-                              if found_target.player != player:
-                                   if not self.player1.visibility_map[found_target.position[1]][found_target.position[0]] == 2:
-                                        print(f"Cannot target unit {target_id_str}. Not currently visible.")
-                                        is_visible = False
-                                        continue # Re-prompt if not visible
-
-                              # Range check for unit-targeted abilities
-                              if distance(unit.position, found_target.position) > unit.attack_range:
-                                   # Check specific range if needed (e.g., Bash is range 1)
-                                   req_range = 1 if unit.ability_name == "Bash" else unit.attack_range
-                                   if distance(unit.position, found_target.position) > req_range:
-                                        print(f"Target unit {target_id_str} is out of ability range ({req_range}).")
-                                        continue
-
-                              if is_visible:
-                                   target_data = found_target # Unit object
-                          else:
-                               print(f"Invalid target ID for ability: {target_id_str}")
-                               continue
-                     elif ability_is_self and len(parts) == 1:
-                         target_data = None # Explicitly None for self-cast
-                     else: # Mismatched parameters
-                          print(f"Invalid target format for '{unit.ability_name}'. Use ID, X Y, or no target as needed.")
-                          continue
-                 elif ability_is_self: # Self-cast or passive activation
-                     if len(parts) > 1:
-                          print(f"Ability '{unit.ability_name}' does not take parameters.")
-                          continue
-                     target_data = None # E.g., for Evade, Charge
-
-                 # If target format is valid (or not needed)
-                 return ("ability", target_data)
-
-            # --- Handle invalid state actions ---
-            elif command.startswith("move") and not can_move:
-                 print(f"{unit.type} (ID: {unit.id}) cannot move (already moved or stunned).")
-            elif command.startswith("attack") and not can_attack:
-                 print(f"{unit.type} (ID: {unit.id}) cannot attack (already attacked or stunned).")
-            elif command.startswith("ability") and not can_abil:
-                 if "Stun" in unit.status_effects:
-                    print(f"{unit.type} (ID: {unit.id}) cannot use ability (stunned).")
-                 elif unit.has_used_ability:
-                    print(f"{unit.type} (ID: {unit.id}) has already used an ability this turn.")
-                 elif not unit.can_use_ability():
-                     print(f"Ability '{unit.ability_name}' is on cooldown ({unit.ability_cooldown_timer} turns).")
-
+            handler = UNIT_COMMAND_HANDLERS.get(verb)
+            if handler:
+                 action = handler(self, unit, parts)
+                 if action:
+                      return action
             else:
                  print("Unknown or invalid action. Try again.")
 
     def show_unit_info(self, unit):
         """Displays detailed information about a unit."""
-        print(f"\n--- Unit Info: {unit.type} (ID: {unit.id}) ---")
-        print(f"  Player: {unit.player.name}")
-        print(f"  Level: {unit.level} (XP: {unit.xp}/{unit.xp_to_next_level})")
-        print(f"  HP: {unit.hp}/{unit.max_hp}")
-        print(f"  Attack: {unit.attack}")
-        print(f"  Defense: {unit.defense}")
-        print(f"  Move Range: {unit.move_range}")
-        print(f"  Attack Range: {unit.attack_range}")
-        print(f"  Vision Range: {unit.vision_range}")
+        lines = []
+        lines.append(f"\n--- Unit Info: {unit.type} (ID: {unit.id}) ---")
+        lines.append(f"  Player: {unit.player.name}")
+        lines.append(f"  Level: {unit.level} (XP: {unit.xp}/{unit.xp_to_next_level})")
+        lines.append(f"  HP: {unit.hp}/{unit.max_hp}")
+        lines.append(f"  Attack: {unit.attack}")
+        lines.append(f"  Defense: {unit.defense}")
+        lines.append(f"  Move Range: {unit.move_range}")
+        lines.append(f"  Attack Range: {unit.attack_range}")
+        lines.append(f"  Vision Range: {unit.vision_range}")
         if unit.ability_name:
              cooldown_status = "Ready" if unit.ability_cooldown_timer <= 0 else f"{unit.ability_cooldown_timer} turns"
-             print(f"  Ability: {unit.ability_name} (Cooldown: {cooldown_status})")
+             lines.append(f"  Ability: {unit.ability_name} (Cooldown: {cooldown_status})")
              if unit.ability_active_timer > 0: # For Long Shot aim duration
-                  print(f"    Passive Effect Active: {unit.ability_active_timer -1} more turns")
+                  lines.append(f"    Passive Effect Active: {unit.ability_active_timer -1} more turns")
         # --- Show Status Effects ---
         if unit.status_effects:
-            print("  Status Effects:")
+            lines.append("  Status Effects:")
             for effect, duration in unit.status_effects.items():
                 info = STATUS_EFFECTS_INFO.get(effect, {"desc": "Unknown effect"})
-                print(f"    - {effect}: {duration} turns ({info['desc']})")
+                lines.append(f"    - {effect}: {duration} turns ({info['desc']})")
         # ------------------------
-        print(f"  Position: {unit.position}")
+        lines.append(f"  Position: {unit.position}")
         tile = self.map.get_tile(unit.position)
         if tile:
-             print(f"  Terrain: {tile.name} (Move Cost: {tile.move_cost}, Def Bonus: {tile.defense_bonus})")
+             lines.append(f"  Terrain: {tile.name} (Move Cost: {tile.move_cost}, Def Bonus: {tile.defense_bonus})")
         actions = []
-        can_move = not unit.has_moved and "Stun" not in unit.status_effects
-        can_attack = not unit.has_attacked and "Stun" not in unit.status_effects
+        can_move = not unit.has_moved and not unit.is_stunned
+        can_attack = not unit.has_attacked and not unit.is_stunned
         can_abil = unit.can_use_ability() and not unit.has_used_ability
 
         if can_move: actions.append("Move")
         if can_attack: actions.append("Attack")
         if can_abil: actions.append("Ability")
-        if "Stun" in unit.status_effects: actions = ["Stunned"]
+        if unit.is_stunned: actions = ["Stunned"]
 
-        print(f"  Actions Left: {', '.join(actions) if actions else 'None'}")
-        print("-------------------------------")
+        lines.append(f"  Actions Left: {', '.join(actions) if actions else 'None'}")
+        lines.append("-------------------------------")
+        print("\n".join(lines)) # One write for the whole panel
 
 
     def handle_action(self, unit, action, data):
         """Executes the chosen action. Returns True if action was successful."""
+        self._visible_enemies = None # Moves, kills and abilities can all change who is visible
         action_taken = False
         if action == "move":
             old_pos = unit.position
@@ -1404,8 +1676,8 @@ class Game:
             unit.has_moved = True
             print(f"{unit.player.name}'s {unit.type} (ID: {unit.id}) moved from {old_pos} to {data}.")
             action_taken = True
-            # Moving reveals new area - update FoW for the player who moved
-            unit.player.update_visibility()
+            # Moving reveals new area - update FoW for the player who moved (only this unit's vision changed)
+            unit.player.update_visibility_after_move(unit, old_pos)
 
         elif action == "attack":
             target_unit = data
@@ -1422,18 +1694,17 @@ class Game:
                      self.map.remove_unit(target_unit) # Remove from tile
                 else:
                      print(f"*** {target_unit.player.name}'s Base has been destroyed! ***")
-                # Re-calculate visibility as losing a unit can reduce vision
-                # Both players might need updates if FoW is strict, but P1 update is most important for display
-                self.player1.update_visibility()
-                if self.player2.is_ai: self.player2.update_visibility()
+            # Losing a unit (target, or attacker on retaliation) can reduce vision; a no-op otherwise
+            self.player1.refresh_visibility()
+            if self.player2.is_ai: self.player2.refresh_visibility()
 
 
         elif action == "ability":
             if unit.use_ability(data): # Target data passed here, method sets flags
                  action_taken = True
-                 # Update visibility if ability reveals area or affects units (e.g., AoE kills)
-                 self.player1.update_visibility()
-                 if self.player2.is_ai: self.player2.update_visibility()
+                 # Update visibility if the ability killed units (e.g., AoE kills)
+                 self.player1.refresh_visibility()
+                 if self.player2.is_ai: self.player2.refresh_visibility()
             else:
                  # Ability use failed (e.g., invalid target), message printed in use_ability
                  action_taken = False
@@ -1452,20 +1723,25 @@ class Game:
 
         return action_taken
 
+    def _ai_pause(self):
+        """Pause between AI actions so a human can follow along (skipped when ai_delay is 0)."""
+        if self.ai_delay:
+            time.sleep(self.ai_delay)
+
     # --- AI Turn Enhancement needed for new units/abilities/status ---
     def perform_ai_turn(self):
         """Enhanced AI Logic"""
         player = self.get_current_player()
         opponent = self.get_opponent()
         print(f"\n--- {player.name}'s Turn ---")
-        time.sleep(0.5) # Small delay
+        self._ai_pause() # Small delay
 
         # --- AI Decision Making ---
 
         # 1. Resource Management / Building
         # --- Added Scout to potential builds ---
         build_priority = ["Warrior", "Archer", "Scout", "Healer", "Mage", "Cavalry"] # Simple build order
-        if player.gold >= UNIT_STATS["Scout"]["cost"]: # Minimum cost check (Scout is cheapest)
+        if player.gold >= UNIT_STATS["Scout"].cost: # Minimum cost check (Scout is cheapest)
             # Simple build condition: if fewer units than opponent or below a threshold, or needs vision
             num_my_units = len([u for u in player.get_alive_units() if u.type != "Base"])
             num_opp_units = len([u for u in opponent.get_alive_units() if u.type != "Base"])
@@ -1476,35 +1752,43 @@ class Game:
             build_unit_condition = num_my_units < num_opp_units or num_my_units < 4
 
             unit_to_build = None
-            if build_scout_condition and player.gold >= UNIT_STATS["Scout"]["cost"]:
+            if build_scout_condition and player.gold >= UNIT_STATS["Scout"].cost:
                 unit_to_build = "Scout"
             elif build_unit_condition:
                  for unit_type in build_priority:
                      if unit_type == "Scout": continue # Already handled above
-                     cost = UNIT_STATS[unit_type]["cost"]
+                     cost = UNIT_STATS[unit_type].cost
                      if player.gold >= cost:
                           unit_to_build = unit_type
                           break # Build the first affordable priority unit
 
             if unit_to_build:
-                print(f"AI: Considering building {unit_to_build} (Cost: {UNIT_STATS[unit_to_build]['cost']}, Gold: {player.gold})")
-                time.sleep(0.5)
+                log.debug("AI: Considering building %s (Cost: %s, Gold: %s)", unit_to_build, UNIT_STATS[unit_to_build].cost, player.gold)
+                self._ai_pause()
                 if player.build_unit(unit_to_build):
-                    print(f"AI: Built {unit_to_build}.")
-                    time.sleep(0.5)
+                    log.debug("AI: Built %s.", unit_to_build)
+                    self._ai_pause()
                     # Assume allows other actions.
 
 
         # 2. Unit Actions (Iterate through units)
-        ai_units = player.get_alive_units()
+        self._visible_enemies = None # A new unit may have revealed enemies
+        ai_units = list(player.get_alive_units()) # Copy, the cached list must not be shuffled
         random.shuffle(ai_units) # Prevent units always acting in the same order
 
+        # Bind per-call lookups once; the unit loop below uses them many times
+        game_map = self.map
+        handle_action = self.handle_action
+        check_win = self.check_win_condition
+        get_visible_enemies = self.get_visible_enemies
+        ai_pause = self._ai_pause
+
         for unit in ai_units:
              if unit.type == "Base" or not unit.can_act(): # Skips stunned units too
                  continue # Skip Base and units that already acted or are stunned
 
-             print(f"\nAI: Considering action for {unit.type} (ID: {unit.id}) at {unit.position}")
-             time.sleep(0.5)
+             log.debug("\nAI: Considering action for %s (ID: %s) at %s", unit.type, unit.id, unit.position)
+             ai_pause()
 
              acted_this_cycle = False # Flag if unit took any action this cycle
 
@@ -1515,85 +1799,95 @@ class Game:
                  if unit.type == "Healer":
                       heal_target = None
                       best_heal_score = 0.7 # Heal if below 70% HP
+                      ux, uy = unit.position
+                      heal_range = unit.attack_range
                       # Check nearby allies
                       for friendly in player.get_alive_units():
                           if friendly.is_alive and friendly != unit and friendly.hp < friendly.max_hp:
-                              if distance(unit.position, friendly.position) <= unit.attack_range: # Heal range
+                              fx, fy = friendly.position
+                              if abs(fx - ux) + abs(fy - uy) <= heal_range: # Heal range (Manhattan)
                                    hp_percent = friendly.hp / friendly.max_hp
                                    if hp_percent < best_heal_score:
                                         best_heal_score = hp_percent
                                         heal_target = friendly
                       if heal_target:
-                          print(f"AI: {unit.type} using Heal on {heal_target.type}")
-                          time.sleep(0.5)
-                          if self.handle_action(unit, "ability", heal_target):
+                          log.debug("AI: %s using Heal on %s", unit.type, heal_target.type)
+                          ai_pause()
+                          if handle_action(unit, "ability", heal_target):
                                 ability_used = True
 
                  # Mage AI: Fireball visible clusters or high-priority targets
                  elif unit.type == "Mage" and unit.ability_name == "Fireball":
                       best_fireball_target_pos = None
-                      best_fireball_score = 1 # Min units hit to consider
-                      visible_enemies = [e for e in opponent.get_alive_units() if player.visibility_map[e.position[1]][e.position[0]] == 2]
-                      potential_targets = []
+                      best_fireball_score = 0 # Units hit by the best blast found so far
+                      best_fireball_value = 0 # Tie-break for equal hits: sum of (10 - hp), favours low HP targets
+                      visible_enemies = get_visible_enemies(player, opponent)
                       aoe_radius = 1
-
-                      # Find all valid target positions in range
-                      for tx in range(MAP_WIDTH):
-                          for ty in range(MAP_HEIGHT):
-                              target_pos = (tx, ty)
-                              if distance(unit.position, target_pos) <= unit.attack_range:
-                                  hits = 0
-                                  score = 0
-                                  for enemy in visible_enemies:
-                                      if distance(target_pos, enemy.position) <= aoe_radius:
-                                          hits += 1
-                                          score += 10 - enemy.hp # Prioritize low HP targets in blast
-                                  if hits >= best_fireball_score:
-                                      # Prefer hitting more units, then lower HP units
-                                      if hits > best_fireball_score or score > potential_targets[-1][0] if potential_targets else -1:
-                                        best_fireball_score = hits
-                                        best_fireball_target_pos = target_pos
-                                        # Store score for tie-breaking if needed, simple approach takes first best
-                                        # potential_targets.append((score, target_pos))
+                      ux, uy = unit.position
+                      attack_range = unit.attack_range
+                      # Gather (x, y, hp) once; every candidate tile is tested against it
+                      enemy_points = [(e.position[0], e.position[1], e.hp) for e in visible_enemies]
+
+                      # Only tiles within the blast radius of a visible enemy can hit anything, so those
+                      # (on the map and in casting range) are the only candidates; dict keeps first-seen order
+                      candidates = {}
+                      for ex, ey, _ in enemy_points:
+                          for dx, dy in manhattan_disk(aoe_radius):
+                              tx, ty = ex + dx, ey + dy
+                              if 0 <= tx < MAP_WIDTH and 0 <= ty < MAP_HEIGHT and abs(tx - ux) + abs(ty - uy) <= attack_range:
+                                  candidates[(tx, ty)] = None
+
+                      for target_pos in candidates:
+                          tx, ty = target_pos
+                          hits = 0
+                          score = 0
+                          for ex, ey, ehp in enemy_points:
+                              if abs(tx - ex) + abs(ty - ey) <= aoe_radius:
+                                  hits += 1
+                                  score += 10 - ehp # Prioritize low HP targets in blast
+                          # Prefer hitting more units, then lower HP units; the first candidate wins exact ties
+                          if hits > best_fireball_score or (hits == best_fireball_score and score > best_fireball_value):
+                              best_fireball_score = hits
+                              best_fireball_value = score
+                              best_fireball_target_pos = target_pos
 
 
                       if best_fireball_target_pos:
-                          print(f"AI: {unit.type} using Fireball at {best_fireball_target_pos} (hitting {best_fireball_score} units)")
-                          time.sleep(0.5)
-                          if self.handle_action(unit, "ability", best_fireball_target_pos):
+                          log.debug("AI: %s using Fireball at %s (hitting %s units)", unit.type, best_fireball_target_pos, best_fireball_score)
+                          ai_pause()
+                          if handle_action(unit, "ability", best_fireball_target_pos):
                               ability_used = True
 
                  # Warrior AI: Bash adjacent high-threat/low-HP enemy if ready
                  elif unit.type == "Warrior" and unit.ability_name == "Bash":
                       bash_target = None
                       best_bash_score = 1000 # Lower is better (HP)
-                      visible_enemies = [e for e in opponent.get_alive_units() if player.visibility_map[e.position[1]][e.position[0]] == 2]
+                      visible_enemies = get_visible_enemies(player, opponent)
                       for enemy in visible_enemies:
                             if distance(unit.position, enemy.position) == 1:
                                 # Prioritize stunning low HP enemies or high threat (e.g., Mage, Healer)
                                 score = enemy.hp
-                                if enemy.type in ["Mage", "Healer"]: score -= 50 # Add bonus value to stunning these
+                                if enemy.type in AI_BASH_PRIORITY_TYPES: score -= 50 # Add bonus value to stunning these
                                 if score < best_bash_score:
                                     best_bash_score = score
                                     bash_target = enemy
                       if bash_target:
-                           print(f"AI: {unit.type} using Bash on {bash_target.type}")
-                           time.sleep(0.5)
-                           if self.handle_action(unit, "ability", bash_target):
+                           log.debug("AI: %s using Bash on %s", unit.type, bash_target.type)
+                           ai_pause()
+                           if handle_action(unit, "ability", bash_target):
                                 ability_used = True
 
                  # Scout AI: Use Evade if enemies are nearby and ability ready
                  elif unit.type == "Scout" and unit.ability_name == "Evade":
                      enemies_nearby = False
-                     for enemy in opponent.get_alive_units():
-                         if player.visibility_map[enemy.position[1]][enemy.position[0]] == 2:
-                            if distance(unit.position, enemy.position) <= 3: # Check if enemies close
-                                enemies_nearby = True
-                                break
+                     for enemy in get_visible_enemies(player, opponent):
+                         if distance(unit.position, enemy.position) <= 3: # Check if enemies close
+                             enemies_nearby = True
+                             break
                      if enemies_nearby:
-                        print(f"AI: {unit.type} using Evade.")
-                        time.sleep(0.5)
-                        if self.handle_action(unit, "ability", None):
+                        log.debug("AI: %s using Evade.", unit.type)
+                        ai_pause()
+                        if handle_action(unit, "ability", None):
                             ability_used = True
 
 
@@ -1605,23 +1899,20 @@ class Game:
 
              # --- AI Attack Logic ---
              if not unit.has_attacked:
-                 potential_targets = unit.get_possible_targets(self.players, self.map) # Already checks visibility via can_attack
+                 # Filter the turn's cached visible-enemy list rather than rescanning every opponent unit
+                 potential_targets = unit.get_possible_targets(self.players, game_map, get_visible_enemies(player, opponent))
 
                  if potential_targets:
                       # Targeting priority:
                       # 1. Lowest HP absolute value
                       # 2. Base > Healer > Mage > Archer > Cavalry > Warrior > Scout (simple priority list)
-                      potential_targets.sort(key=lambda t: (
-                          t.hp,
-                          {"Base":0, "Healer":1, "Mage":2, "Archer":3, "Cavalry":4, "Warrior":5, "Scout": 6}.get(t.type, 99)
-                      ))
-                      target = potential_targets[0]
-                      print(f"AI: {unit.type} attacking {target.type} (HP: {target.hp})")
-                      time.sleep(0.5)
-                      if self.handle_action(unit, "attack", target):
+                      target = min(potential_targets, key=lambda t: (t.hp, AI_TARGET_PRIORITY.get(t.type, 99)))
+                      log.debug("AI: %s attacking %s (HP: %s)", unit.type, target.type, target.hp)
+                      ai_pause()
+                      if handle_action(unit, "attack", target):
                           acted_this_cycle = True
                           # Check win condition immediately after attack
-                          winner = self.check_win_condition()
+                          winner = check_win()
                           if winner: return True # End AI turn early
                           # Check if unit's turn ended due to attack/retaliation
                           if not unit.can_act(): continue
@@ -1631,81 +1922,77 @@ class Game:
              if not unit.has_moved:
                  # Find nearest visible enemy or opponent base
                  target_enemy_obj = None
-                 min_dist = float('inf')
-                 visible_enemies = [e for e in opponent.get_alive_units() if player.visibility_map[e.position[1]][e.position[0]] == 2]
+                 target_pos = None # Goal position to move towards (enemy, base, or explore point)
+                 visible_enemies = get_visible_enemies(player, opponent)
 
                  # --- Scout Move Logic: Prioritize exploring unseen areas or spotting ---
                  if unit.type == "Scout":
                      # Very simple: move towards opponent base if nothing seen, otherwise flank/spot
                      if not visible_enemies and opponent.base_unit and opponent.base_unit.is_alive:
                         target_enemy_obj = opponent.base_unit
-                        min_dist = distance(unit.position, target_enemy_obj.position)
                      elif visible_enemies:
                          # Move towards average position of enemies or nearest? Let's try nearest.
-                         for enemy_unit in visible_enemies:
-                             d = distance(unit.position, enemy_unit.position)
-                             if d < min_dist:
-                                 min_dist = d
-                                 target_enemy_obj = enemy_unit
+                         target_enemy_obj = min(visible_enemies, key=lambda e: distance(unit.position, e.position))
                      # If still no target, move towards center map? Or random explore?
                      if not target_enemy_obj:
                          # Simple explore: move towards center tile
                          center_pos = (MAP_WIDTH // 2, MAP_HEIGHT // 2)
-                         target_enemy_obj = Node(center_pos) # Fake target node for pathing goal
-                         min_dist = distance(unit.position, center_pos)
+                         target_pos = center_pos # Explore goal, no target unit
 
                  # --- Default Move Logic ---
                  else:
                      if visible_enemies:
-                          for enemy_unit in visible_enemies:
-                              d = distance(unit.position, enemy_unit.position)
-                              if d < min_dist:
-                                   min_dist = d
-                                   target_enemy_obj = enemy_unit
+                          target_enemy_obj = min(visible_enemies, key=lambda e: distance(unit.position, e.position)) # Nearest
                      # No visible enemies, move towards opponent's base
                      elif opponent.base_unit and opponent.base_unit.is_alive:
                           target_enemy_obj = opponent.base_unit # Move towards base if no units seen
-                          min_dist = distance(unit.position, target_enemy_obj.position)
 
                  if target_enemy_obj:
                       target_pos = target_enemy_obj.position
+
+                 # Already in attack range of the target (same rule as can_attack) and either done
+                 # attacking or able to see it: moving gains nothing, so skip the move search and A*
+                 # and hold position. An unseen target in range (e.g. the Base beyond vision) cannot
+                 # be attacked, so the unit still moves to get sight of it.
+                 engaged = False
+                 if isinstance(target_enemy_obj, Unit):
+                      dist_to_target = distance(unit.position, target_pos)
+                      if dist_to_target <= unit.attack_range and (
+                              unit.has_attacked or
+                              player.visibility_map[target_pos[1] * MAP_WIDTH + target_pos[0]] == 2):
+                           engaged = (unit.attack_range == 1 or dist_to_target == 1 or
+                                      has_line_of_sight(game_map, unit.position, target_pos))
+
+                 if engaged:
+                      log.debug("AI: %s holds position in range of %s.", unit.type, target_enemy_obj.type)
+                      if not acted_this_cycle:
+                           handle_action(unit,"wait",None)
+                           acted_this_cycle = True
+
+                 elif target_pos:
                       # Find the best tile to move to: closest to target using path distance heuristic
                       best_move_pos = unit.position
                       # Prefer tiles that allow attacking the target after moving, then closest distance
                       best_path_cost = float('inf') # A* cost to reach target from move pos
                       can_attack_from_best = False
 
-                      possible_moves = unit.get_valid_moves(self.map)
+                      possible_moves = unit.get_valid_moves(game_map)
+                      attack_range = unit.attack_range
+                      targets_unit = isinstance(target_enemy_obj, Unit)
+                      tx, ty = target_pos
 
                       for move_pos in possible_moves:
                           if move_pos == unit.position: continue
 
-                          # Check if can attack target from this move_pos
-                          temp_unit_state = {"position": move_pos, "attack_range": unit.attack_range} # Simplified mock state
+                          # Manhattan distance to the target, inlined: this loop runs for every reachable tile
+                          dist_from_move = abs(move_pos[0] - tx) + abs(move_pos[1] - ty)
+
+                          # Check if can attack target from this move_pos (only if the primary target is a real unit)
                           can_attack_after_move = False
-                          # Check only if the primary target is a real unit
-                          if isinstance(target_enemy_obj, Unit):
-                              if distance(move_pos, target_pos) <= unit.attack_range:
-                                   # Basic LoS check from potential move spot
-                                   # TODO: Reuse can_attack's LoS logic more directly? This is simplified.
-                                   line_clear = True
-                                   if unit.attack_range > 1 and distance(move_pos, target_pos) > 1:
-                                        dx = target_pos[0] - move_pos[0]
-                                        dy = target_pos[1] - move_pos[1]
-                                        check_x, check_y = target_pos[0], target_pos[1]
-                                        if abs(dx) > abs(dy): check_x -= int(math.copysign(1, dx))
-                                        elif abs(dy) > abs(dx): check_y -= int(math.copysign(1, dy))
-                                        else:
-                                             check_x -= int(math.copysign(1, dx)); check_y -= int(math.copysign(1, dy))
-                                        block_pos = (check_x, check_y)
-                                        if block_pos != move_pos and self.map.is_valid_coordinate(block_pos):
-                                            if self.map.get_tile(block_pos).terrain_key in ["M", "F"]:
-                                                line_clear = False
-                                   if line_clear:
-                                       can_attack_after_move = True
-
-
-                          dist_from_move = distance(move_pos, target_pos) # Manhattan distance as heuristic
+                          if targets_unit and dist_from_move <= attack_range:
+                              # LoS check from potential move spot (same rule as can_attack)
+                              if attack_range == 1 or dist_from_move == 1 or has_line_of_sight(game_map, move_pos, target_pos):
+                                  can_attack_after_move = True
 
                           # Prioritize spots enabling attack, then closest spots
                           if can_attack_after_move:
@@ -1721,23 +2008,37 @@ class Game:
                                    best_move_pos = move_pos
                                    best_path_cost = dist_from_move
 
+                      # No attack spot: follow the terrain-aware shortest path instead of the straight-line
+                      # closest tile, advancing to the furthest path tile reachable this turn.
+                      # (Manhattan pick above stays as the fallback when no path exists.)
+                      if not can_attack_from_best:
+                          path = a_star_pathfinding(game_map, unit.position, target_pos, terrain_move_cost)
+                          if path:
+                              path_move_pos = unit.position
+                              for step_pos in path[1:]:
+                                  if step_pos not in possible_moves:
+                                      break # Beyond this turn's movement (or the occupied goal itself)
+                                  path_move_pos = step_pos
+                              if path_move_pos != unit.position:
+                                  best_move_pos = path_move_pos
+
                       if best_move_pos != unit.position:
-                          print(f"AI: {unit.type} moving from {unit.position} to {best_move_pos} towards {target_pos}")
-                          time.sleep(0.5)
-                          if self.handle_action(unit, "move", best_move_pos):
+                          log.debug("AI: %s moving from %s to %s towards %s", unit.type, unit.position, best_move_pos, target_pos)
+                          ai_pause()
+                          if handle_action(unit, "move", best_move_pos):
                               acted_this_cycle = True
                               # --- AI Attack after Move ---
                               # Check if the unit *can still act* (e.g. didn't retaliate during move)
                               # and *can attack* the original target from the new position
                               if unit.can_act() and not unit.has_attacked and isinstance(target_enemy_obj, Unit):
                                   # Re-check visibility and can_attack from new position
-                                  is_visible = player.visibility_map[target_enemy_obj.position[1]][target_enemy_obj.position[0]] == 2
-                                  if is_visible and unit.can_attack(target_enemy_obj, self.map):
-                                      print(f"AI: {unit.type} attacking {target_enemy_obj.type} after moving.")
-                                      time.sleep(0.5)
-                                      if self.handle_action(unit, "attack", target_enemy_obj):
+                                  is_visible = player.visibility_map[target_enemy_obj.position[1] * MAP_WIDTH + target_enemy_obj.position[0]] == 2
+                                  if is_visible and unit.can_attack(target_enemy_obj, game_map):
+                                      log.debug("AI: %s attacking %s after moving.", unit.type, target_enemy_obj.type)
+                                      ai_pause()
+                                      if handle_action(unit, "attack", target_enemy_obj):
                                           # Check win condition
-                                          winner = self.check_win_condition()
+                                          winner = check_win()
                                           if winner: return True
                                           if not unit.can_act(): continue # End turn if attack finished it
                                       else: # Attack failed? Should be rare here
@@ -1746,17 +2047,17 @@ class Game:
                           # Check if unit's turn ended after move/attack
                           if not unit.can_act(): continue
                       else: # No better move found
-                          print(f"AI: {unit.type} at {unit.position} cannot find a better position or is blocked.")
+                          log.debug("AI: %s at %s cannot find a better position or is blocked.", unit.type, unit.position)
                           # If no action taken at all this cycle, wait
                           if not acted_this_cycle:
-                              print(f"AI: {unit.type} waiting.")
-                              self.handle_action(unit,"wait",None)
+                              log.debug("AI: %s waiting.", unit.type)
+                              handle_action(unit,"wait",None)
                               acted_this_cycle = True # Mark as acted
 
                  else: # No target enemy found (no visible units, base destroyed/unreachable?)
-                     print(f"AI: {unit.type} sees no targets. Waiting.")
+                     log.debug("AI: %s sees no targets. Waiting.", unit.type)
                      if not acted_this_cycle:
-                          self.handle_action(unit,"wait",None)
+                          handle_action(unit,"wait",None)
                           acted_this_cycle = True
 
              # Final check if unit has actions left after all phases - if not, move to next unit
@@ -1764,33 +2065,36 @@ class Game:
 
              # If unit still has actions but didn't do anything useful (e.g., moved but couldn't attack)
              if not acted_this_cycle:
-                 print(f"AI: {unit.type} finished turn without optimal action. Waiting.")
-                 self.handle_action(unit,"wait",None)
+                 log.debug("AI: %s finished turn without optimal action. Waiting.", unit.type)
+                 handle_action(unit,"wait",None)
 
 
-             winner = self.check_win_condition()
+             winner = check_win()
              if winner: return True # Check win condition after each unit
 
         print(f"--- {player.name} Turn End ---")
         return False # Game not over
 
+    def base_destroyed(self, player):
+        """Record the winner when `player`'s Base falls (Player 1 wins if both fall)."""
+        winner = self.player1 if player is self.player2 else self.player2
+        if self._winner is None or winner is self.player1:
+            self._winner = winner
+
     def check_win_condition(self):
-        # Win condition is destroying the enemy Base
-        if not self.player2.base_unit or not self.player2.base_unit.is_alive:
-            return self.player1 # Player 1 wins
-        if not self.player1.base_unit or not self.player1.base_unit.is_alive:
-            return self.player2 # Player 2 (AI) wins
-        return None
+        # Win condition is destroying the enemy Base; base_destroyed records it as it happens
+        return self._winner
 
     # --- Added Save/Load Methods ---
     def save_game(self, filename=None):
-        """Saves the current game state to a file using pickle."""
+        """Saves the current game state to a file using pickle (derived map tables and caches are left out)."""
         if filename is None:
-             timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+             timestamp = time.strftime("%Y%m%d_%H%M%S")
              filename = f"tbs_save_{timestamp}.pkl"
         try:
             with open(filename, 'wb') as f:
-                pickle.dump(self, f)
+                f.write(SAVE_MAGIC + bytes((SAVE_VERSION,)))
+                pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
             print(f"Game saved successfully to {filename}")
             return True
         except Exception as e:
@@ -1803,9 +2107,12 @@ class Game:
         # Find the most recent save file if default is used
         if filename == "tbs_save.pkl":
              try:
-                 save_files = [f for f in os.listdir('.') if f.startswith('tbs_save_') and f.endswith('.pkl')]
+                 # One directory pass; DirEntry caches its stat, so each match costs at most one stat call
+                 with os.scandir('.') as entries:
+                     save_files = [(entry.stat().st_mtime, entry.name) for entry in entries
+                                   if entry.name.startswith('tbs_save_') and entry.name.endswith('.pkl')]
                  if save_files:
-                     filename = max(save_files, key=lambda f: os.path.getmtime(f))
+                     filename = max(save_files)[1]
                      print(f"Loading most recent save: {filename}")
                  else:
                      print("No default save files found (tbs_save_*.pkl).")
@@ -1817,14 +2124,19 @@ class Game:
 
         try:
             with open(filename, 'rb') as f:
+                # Check the header before unpickling anything, so other files are rejected up front
+                header = f.read(len(SAVE_MAGIC) + 1)
+                if header[:len(SAVE_MAGIC)] != SAVE_MAGIC:
+                    print(f"Error loading game: '{filename}' is not a save file from this game.")
+                    return None
+                if header[len(SAVE_MAGIC):] != bytes((SAVE_VERSION,)):
+                    print(f"Error loading game: '{filename}' uses an unsupported save format version.")
+                    return None
                 loaded_game = pickle.load(f)
             if isinstance(loaded_game, Game):
+                # Player.game and Unit.player back-references are restored by pickle itself:
+                # the whole graph is pickled together, so shared objects and cycles keep their identity
                 print(f"Game loaded successfully from {filename}")
-                # Need to re-establish the link from players back to the loaded game object
-                # Pickle might handle this, but good to double check or reset
-                for player in loaded_game.players:
-                    player.game = loaded_game
-                print("Verifying player links...") # Add more checks if needed
                 return loaded_game
             else:
                 print(f"Error loading game: File '{filename}' does not contain a valid Game object.")
@@ -1859,8 +2171,9 @@ class Game:
                 # Let's move start_turn_updates to *after* next_turn call.
 
                 if current_player.is_ai:
-                    game_instance.display_game_state(selected_unit=None) # Show state before AI moves
-                    input("Press Enter to begin AI turn...") # Pause before AI acts
+                    if game_instance.interactive:
+                        game_instance.display_game_state(selected_unit=None) # Show state before AI moves
+                        input("Press Enter to begin AI turn...") # Pause before AI acts
                     game_over = game_instance.perform_ai_turn()
                     winner = game_instance.check_win_condition()
                     if winner: break
@@ -1870,12 +2183,18 @@ class Game:
                     continue
 
                 # --- Human Player Turn ---
-                game_instance.display_game_state(selected_unit) # Pass selected unit for highlighting
                 action_phase_over = False
+                units_can_act_stale = True # Rescan only after something that can change it, not per keypress
+                needs_redraw = True # Redraw only after the board or the selection changed, not per keypress
 
                 while not action_phase_over and not load_requested:
+                    if needs_redraw:
+                        game_instance.display_game_state(selected_unit) # Pass selected unit for highlighting
+                        needs_redraw = False
                     # Check if player can still act
-                    units_can_act = current_player.units_can_act()
+                    if units_can_act_stale:
+                        units_can_act = current_player.units_can_act()
+                        units_can_act_stale = False
                     if not units_can_act and not selected_unit: # If no unit selected and none can act
                          print("\nAll your units have finished their actions for this turn.")
                          action_phase_over = True
@@ -1897,17 +2216,17 @@ class Game:
                             game_instance.save_game()
                             # Continue turn after saving
                             input("Game saved. Press Enter to continue turn.")
-                            game_instance.display_game_state(selected_unit) # Refresh display
                             continue
                         elif action == "load":
                             load_requested = True # Signal outer loop to reload
                             break # Exit inner loops
                         elif action == "select":
                             selected_unit = data
-                            game_instance.display_game_state(selected_unit) # Show highlights
-                            # Loop back to handle selected unit's action next
+                            needs_redraw = True # Show highlights
+                            continue # Loop back to redraw, then handle selected unit's action
                         elif action == "build_success":
-                            game_instance.display_game_state(selected_unit) # Redraw state after building
+                            units_can_act_stale = True # New unit may be able to act
+                            needs_redraw = True # Redraw state after building
                             # Continue allowing actions
                         else: # Help or error, loop back
                             continue
@@ -1918,18 +2237,19 @@ class Game:
                          if not selected_unit.can_act():
                               print(f"{selected_unit.type} (ID: {selected_unit.id}) cannot act anymore this turn.")
                               selected_unit = None # Deselect
-                              game_instance.display_game_state(selected_unit) # Update display (remove highlights)
+                              needs_redraw = True # Update display (remove highlights)
                               continue # Go back to global commands/selection
 
                          action, data = game_instance.get_unit_action(selected_unit)
 
                          if action == "cancel":
                               selected_unit = None
-                              game_instance.display_game_state(selected_unit) # Update display (remove highlights)
+                              needs_redraw = True # Update display (remove highlights)
                               continue # Go back to global commands/selection
 
                          # Perform the action
                          action_successful = game_instance.handle_action(selected_unit, action, data)
+                         units_can_act_stale = True
 
                          # After action, check win condition
                          winner = game_instance.check_win_condition()
@@ -1943,12 +2263,11 @@ class Game:
                               if not selected_unit.can_act():
                                    selected_unit = None
                               # Redisplay needed AFTER potential deselection to update highlights
-                              game_instance.display_game_state(selected_unit) # Show result of action
+                              needs_redraw = True # Show result of action
                          else:
-                              # Action failed, keep unit selected and let player try again
+                              # Action failed, keep unit selected and let player try again.
+                              # Nothing changed, so no redraw (which would also clear this message)
                               print("Action failed or was invalid. Try again.")
-                              # Redisplay state even on failure? Maybe not needed.
-                              game_instance.display_game_state(selected_unit)
 
 
                  # --- End of Human Action Phase ---
@@ -1990,6 +2309,10 @@ class Game:
 
 # --- Main Execution ---
 if __name__ == "__main__":
+    # Unit messages go through the logger; show them on the console at INFO.
+    # The AI's decision trace is logged at DEBUG, so it stays hidden unless the level is lowered.
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stdout)
+
     # Define the map layout (W=Width, H=Height)
     # P=Plains, M=Mtn, F=Forest, G=Gold Mine, B=Base (Base locations set in Game init)
     map_layout_default = [